@@ -0,0 +1,199 @@
+# Default number of entries (log2) of the computed table
+CACHE_BITS = 18
+
+class BDD:
+    ''' Reduced ordered binary decision diagrams sharing one unique table.
+        Nodes are integer ids: 0 and 1 are the terminals, every other node
+        has a variable (its position on the order) and low/high children.
+        Equal functions are always the same node '''
+
+    # Class constructor
+    def __init__(self, nvars, cacheBits = CACHE_BITS):
+
+        self.nvars = nvars
+
+        # Node arrays, terminals are below every variable
+        self.var = [nvars, nvars]
+        self.low = [0, 1]
+        self.high = [0, 1]
+
+        # (var, low, high) -> node
+        self.unique = {}
+
+        # Computed table of ite results, direct mapped: a new result
+        # evicts the one on its slot, so its size is bounded
+        self.computed = [None]*(1 << cacheBits)
+        self._cacheMask = (1 << cacheBits) - 1
+
+        # Number of satisfying assignments of each counted node
+        self._counts = {}
+
+    def node(self, var, low, high):
+        ''' The node testing var, reduced and shared '''
+
+        if low == high:
+            return low
+
+        key = (var, low, high)
+        node = self.unique.get(key)
+
+        if node == None:
+            node = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+
+        return node
+
+    def variable(self, var):
+        ''' Function of a single variable '''
+
+        assert 0 <= var < self.nvars, "[ERROR] INVALID VARIABLE (" + str(var) + ")"
+
+        return Function(self, self.node(var, 0, 1))
+
+    def constant(self, value):
+        ''' Constant function '''
+
+        return Function(self, 1 if value else 0)
+
+    def ite(self, f, g, h):
+        ''' If f then g else h, on nodes '''
+
+        # Terminal cases
+        if f == 1:
+            return g
+        if f == 0:
+            return h
+        if g == h:
+            return g
+        if g == 1 and h == 0:
+            return f
+
+        key = (f, g, h)
+        slot = hash(key) & self._cacheMask
+        entry = self.computed[slot]
+        if entry != None and entry[0] == key:
+            return entry[1]
+
+        # Shannon expansion on the topmost variable
+        var = min(self.var[f], self.var[g], self.var[h])
+        f0, f1 = self._cofactors(f, var)
+        g0, g1 = self._cofactors(g, var)
+        h0, h1 = self._cofactors(h, var)
+
+        node = self.node(var, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        self.computed[slot] = (key, node)
+
+        return node
+
+    def _cofactors(self, node, var):
+        ''' Low and high cofactors of a node on var '''
+
+        if self.var[node] != var:
+            return node, node
+
+        return self.low[node], self.high[node]
+
+    def count(self, node):
+        ''' Number of assignments of every variable making a node true '''
+
+        counts = self._counts
+        var = self.var
+        low = self.low
+        high = self.high
+
+        # Assignments of the variables from the node variable on
+        counts[0] = 0
+        counts[1] = 1
+        stack = [node]
+
+        while stack:
+            n = stack[-1]
+            if n in counts:
+                stack.pop()
+                continue
+
+            l, h = low[n], high[n]
+            if l not in counts:
+                stack.append(l)
+            elif h not in counts:
+                stack.append(h)
+            else:
+                counts[n] = (counts[l] << (var[l] - var[n] - 1)) + (counts[h] << (var[h] - var[n] - 1))
+                stack.pop()
+
+        return counts[node] << var[node]
+
+    def satisfy(self, node):
+        ''' One assignment (an int with bit i for variable i) making a node
+            true, variables not on the path being 0. None if it is never true '''
+
+        if node == 0:
+            return None
+
+        assignment = 0
+        while node != 1:
+            if self.high[node] != 0:
+                assignment |= 1 << self.var[node]
+                node = self.high[node]
+            else:
+                node = self.low[node]
+
+        return assignment
+
+class Function:
+    ''' Node of a BDD with the bitwise operators of an int word, so gates can
+        evaluate it as they evaluate words (_evaluateWords). The int 0 stands
+        for false and -1 (all bits set) for true '''
+
+    __slots__ = ('bdd', 'node')
+
+    def __init__(self, bdd, node):
+        self.bdd = bdd
+        self.node = node
+
+    def _nodeOf(self, other):
+        ''' Node of another function or of the ints 0 and -1 '''
+
+        if isinstance(other, Function):
+            assert other.bdd is self.bdd, "[ERROR] FUNCTIONS OF DIFFERENT BDDs"
+            return other.node
+
+        assert other == 0 or other == -1, "[ERROR] ONLY 0 AND -1 ARE CONSTANT FUNCTIONS"
+
+        return 0 if other == 0 else 1
+
+    def __and__(self, other):
+        return Function(self.bdd, self.bdd.ite(self.node, self._nodeOf(other), 0))
+
+    def __or__(self, other):
+        return Function(self.bdd, self.bdd.ite(self.node, 1, self._nodeOf(other)))
+
+    def __xor__(self, other):
+        other = self._nodeOf(other)
+        return Function(self.bdd, self.bdd.ite(self.node, self.bdd.ite(other, 0, 1), other))
+
+    def __invert__(self):
+        return Function(self.bdd, self.bdd.ite(self.node, 0, 1))
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __bool__(self):
+        return self.node != 0
+
+    def satisfy(self):
+        ''' One assignment making this function true, or None '''
+
+        return self.bdd.satisfy(self.node)
+
+    def count(self):
+        ''' Number of assignments making this function true '''
+
+        return self.bdd.count(self.node)
+
+if __name__ == "__main__":
+    pass
@@ -1,14 +1,17 @@
-from LogicGate import LogicGate
+from LogicGate import LogicGate, internTable
 
 class NOTGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies NOT logic  '''
@@ -17,15 +20,28 @@ class NOTGate(LogicGate):
 		for i in range(0, self.getInputNum()):
 			self._addOutputValue(i, i^1)
 			
+	def _function(self, input):
+		''' Applies NOT logic to an input '''
+		
+		return input ^ 1
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies NOT logic bitwise '''
+		
+		return [~words[0] & mask]
+			
 class ANDGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies AND logic  '''
@@ -34,17 +50,34 @@ class ANDGate(LogicGate):
 		for i in range(0, self.getInputNum()-1):
 			self._addOutputValue(i, 0)
 
-		self._addOutputValue(self.nbitsInput-1, 1);
+		self._addOutputValue(self.getInputNum()-1, 1);
+		
+	def _function(self, input):
+		''' Applies AND logic to an input (1 only for all ones) '''
+		
+		return (input + 1) >> self.nbitsInput
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies AND logic bitwise '''
+		
+		output = mask
+		for word in words:
+			output &= word
+			
+		return [output]
 		
 class ORGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies OR logic  '''
@@ -54,84 +87,171 @@ class ORGate(LogicGate):
 			self._addOutputValue(i, 1)
 
 		self._addOutputValue(0, 0);
+		
+	def _function(self, input):
+		''' Applies OR logic to an input (0 only for all zeros) '''
+		
+		return (input + (1 << self.nbitsInput) - 1) >> self.nbitsInput
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies OR logic bitwise '''
+		
+		output = 0
+		for word in words:
+			output |= word
+			
+		return [output]
 
 class NANDGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies NAND logic  '''
 		
 		# (0 only if all inputs are 1) '''
 		for i in range(0, self.getInputNum()-1):
-			self._addOutputValue(0, 1)
+			self._addOutputValue(i, 1)
 
-		self._addOutputValue(self.nbitsInput-1, 0);
+		self._addOutputValue(self.getInputNum()-1, 0);
+		
+	def _function(self, input):
+		''' Applies NAND logic to an input (0 only for all ones) '''
+		
+		return 1 - ((input + 1) >> self.nbitsInput)
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies NAND logic bitwise '''
+		
+		output = mask
+		for word in words:
+			output &= word
+			
+		return [~output & mask]
 
 class NORGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies NOR logic  '''
 		
 		# (1 only if all inputs are 0) '''
 		for i in range(1, self.getInputNum()):
-			self._addOutputValue(0, 0)
+			self._addOutputValue(i, 0)
 
 		self._addOutputValue(0, 1);
 		
+	def _function(self, input):
+		''' Applies NOR logic to an input (1 only for all zeros) '''
+		
+		return 1 - ((input + (1 << self.nbitsInput) - 1) >> self.nbitsInput)
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies NOR logic bitwise '''
+		
+		output = 0
+		for word in words:
+			output |= word
+			
+		return [~output & mask]
+		
 class MAJGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput)
+		super().__init__(name, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies MAJORITY logic  '''
 		
 		# If more than half are 'X', than we have 'X' '''
 		for i in range(0, self.getInputNum()):
+			self._addOutputValue(i, 1 if i.bit_count() > (self.nbitsInput>>1) else 0)
+				
+	def _function(self, input):
+		''' Applies MAJORITY logic to an input (more than half ones) '''
 		
-			mask = 1
-			times = 0
+		if isinstance(input, int):
+			return 1 if input.bit_count() > (self.nbitsInput>>1) else 0
 			
-			for j in range(0, self.getInputNum()):
-				if (mask & i):
-					times += 1
+		# Array of inputs, counts their ones bit by bit
+		ones = input & 1
+		for bit in range(1, self.nbitsInput):
+			ones += (input >> bit) & 1
+			
+		return (ones > (self.nbitsInput>>1)).astype(input.dtype)
+				
+	def _evaluateWords(self, words, mask):
+		''' Applies MAJORITY logic bitwise '''
+		
+		# Usual 3 input majority
+		if self.nbitsInput == 3:
+			a, b, c = words
+			return [(a & b) | (a & c) | (b & c)]
+			
+		# Bit sliced count of ones (one word per count bit), adding each input
+		count = []
+		for word in words:
+			carry = word
+			for bit in range(0, len(count)):
+				count[bit], carry = count[bit] ^ carry, count[bit] & carry
+				if not carry:
+					break
+			if carry:
+				count.append(carry)
 				
-				mask = mask << 1
-					
-			if times > (self.nbitsInput>>1):
-				self._addOutputValue(i, 1)
+		# Compares the count with the threshold, from the most significant bit
+		threshold = (self.nbitsInput>>1) + 1
+		greater = 0
+		equal = mask
+		for bit in range(max(len(count), threshold.bit_length()) - 1, -1, -1):
+			word = count[bit] if bit < len(count) else 0
+			if (threshold >> bit) & 1:
+				equal &= word
 			else:
-				self._addOutputValue(i, 0)
+				greater |= equal & word
+				equal &= ~word
+				
+		return [greater | equal]
 				
 class BUFFERGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput, nbitsInput)
+		super().__init__(name, nbitsInput, nbitsInput)
 		
-		# Creates all outputs from inputs
-		self._createOutputs()
+		# Shares the outputs of every gate of this type and width, creating them
+		# for the first one (lazy gates compute them instead)
+		self._internOutputs()
 		
 	def _createOutputs(self):
 		''' Applies BUFFER logic  '''
@@ -140,19 +260,33 @@ class BUFFERGate(LogicGate):
 		for i in range(0, self.getInputNum()):
 			self._addOutputValue(i, i)
 			
+	def _function(self, input):
+		''' Applies BUFFER logic to an input '''
+		
+		return input
+		
+	def _evaluateWords(self, words, mask):
+		''' Applies BUFFER logic bitwise '''
+		
+		return list(words)
+			
 class GENERICGate(LogicGate):
 
-	def __init__(self, circuitid, name, nbitsInput, nbitsOutput, logic_inputs, logic_outputs):
+	__slots__ = ()
+
+	def __init__(self, name, nbitsInput, nbitsOutput, logic_inputs, logic_outputs):
 	
 		# Base class constructor with nbitsInput and 1 output
-		super().__init__(circuitid, name, nbitsInput, nbitsOutput)
+		super().__init__(name, nbitsInput, nbitsOutput)
 		
-		# Creates all outputs from inputs
+		# Creates all outputs from inputs, then shares the table with every
+		# gate of the same outputs
 		self.__createOutputs(logic_inputs, logic_outputs)
+		self.truthTable = internTable(self.truthTable)
 		
 	def __createOutputs(self, logic_inputs, logic_outputs):
 		''' Applies GENERIC logic  '''
-		for i in range(0, logic_inputs):
+		for i in range(0, len(logic_inputs)):
 			self._addOutputValue(logic_inputs[i], logic_outputs[i])
 		
 	def _createOutputs(self):
@@ -0,0 +1,147 @@
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+
+# File layout: header, section table, then every section aligned to 8 bytes.
+# Sections hold native unsigned integers; files written on a machine with
+# another byte order are treated as stale.
+MAGIC = b'DECC'
+VERSION = 2
+_HEADER = struct.Struct('<4sII32sI')
+_SECTION = struct.Struct('<cxxxQQ')
+
+# Sections, in file order
+NAMES = 0           # bytes, every name followed by a zero byte
+GATES = 1           # 'I', (type, nbitsInput, nbitsOutput, table) per port, table being LAZY
+                    # for gates computing their function
+TABLES = 2          # 'Q', (offset, length, itemsize) per interned truth table
+TABLEDATA = 3       # bytes, every truth table
+EDGES = 4           # 'I', (origin, originBit, destinyBit, destiny) per connection
+ORDER = 5           # 'I', port of each compiled gate, in level order
+LEVELS = 6          # 'I', level of each compiled gate
+FANINSTART = 7      # 'I', first fanin net of each compiled gate (one more entry)
+FANINNET = 8        # 'I', fanin nets of every compiled gate
+SECTIONS = 9
+
+# Table of gates without a stored truth table
+LAZY = 0xFFFFFFFF
+
+# Array typecode of each item size, for truth tables
+_TYPECODES = {array(t).itemsize : t for t in ('Q', 'L', 'I', 'H', 'B')}
+
+def cachePath(filename):
+    ''' Path of the compiled cache of a circuit file, beside it '''
+
+    return os.path.splitext(filename)[0] + '.cbin'
+
+def writeCache(path, digest, names, gates, tables, edges, compiled):
+    ''' Writes a compiled circuit. names is a list of strings, gates a list of
+        (type, nbitsInput, nbitsOutput, table) tuples, tables a list of arrays,
+        edges a list of (origin, originBit, destinyBit, destiny) tuples and compiled
+        a tuple of (order, levels, faninStart, faninNet) lists '''
+
+    # Truth tables, one after the other, each aligned to 8 bytes
+    tabledata = bytearray()
+    tableinfo = []
+    for table in tables:
+        tableinfo.extend((len(tabledata), len(table), table.itemsize))
+        tabledata += table.tobytes()
+        tabledata += bytes(-len(tabledata) % 8)
+
+    sections = [None]*SECTIONS
+    sections[NAMES] = b''.join(name.encode() + b'\0' for name in names)
+    sections[GATES] = array('I', [value for gate in gates for value in gate])
+    sections[TABLES] = array('Q', tableinfo)
+    sections[TABLEDATA] = bytes(tabledata)
+    sections[EDGES] = array('I', [value for edge in edges for value in edge])
+    sections[ORDER] = array('I', compiled[0])
+    sections[LEVELS] = array('I', compiled[1])
+    sections[FANINSTART] = array('I', compiled[2])
+    sections[FANINNET] = array('I', compiled[3])
+
+    # Section table
+    offset = _HEADER.size + SECTIONS*_SECTION.size
+    offset += -offset % 8
+    table = []
+    for section in sections:
+        typecode = section.typecode if isinstance(section, array) else 'B'
+        data = section.tobytes() if isinstance(section, array) else section
+        table.append((typecode, offset, len(data)))
+        offset += len(data) + (-len(data) % 8)
+
+    byteorder = 0 if sys.byteorder == 'little' else 1
+
+    # Writes to a temporary file first, so readers never see half a file
+    temporary = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, byteorder, digest, SECTIONS))
+        for typecode, offset, size in table:
+            f.write(_SECTION.pack(typecode.encode(), offset, size))
+
+        for section, (typecode, offset, size) in zip(sections, table):
+            f.write(bytes(offset - f.tell()))
+            f.write(section.tobytes() if isinstance(section, array) else section)
+
+    os.replace(temporary, path)
+
+class CircuitImage:
+    ''' Memory mapped compiled circuit. Sections are zero-copy memoryviews
+        of the file, which stays mapped while any of them is alive '''
+
+    # Class constructor
+    def __init__(self, buffer):
+
+        view = memoryview(buffer)
+        self.sections = []
+
+        for i in range(0, SECTIONS):
+            typecode, offset, size = _SECTION.unpack_from(view, _HEADER.size + i*_SECTION.size)
+            section = view[offset:offset + size]
+            if typecode != b'B':
+                section = section.cast(typecode.decode())
+            self.sections.append(section)
+
+        self.names = bytes(self.sections[NAMES]).decode().split('\0')[:-1]
+        self.gates = self.sections[GATES]
+        self.edges = self.sections[EDGES]
+        self.compiled = tuple(self.sections[i] for i in (ORDER, LEVELS, FANINSTART, FANINNET))
+
+    def tables(self):
+        ''' Interned truth tables, as memoryviews of the file '''
+
+        info = self.sections[TABLES]
+        data = self.sections[TABLEDATA]
+        tables = []
+
+        for i in range(0, len(info), 3):
+            offset, length, itemsize = info[i], info[i+1], info[i+2]
+            tables.append(data[offset:offset + length*itemsize].cast(_TYPECODES[itemsize]))
+
+        return tables
+
+def readCache(path, digest):
+    ''' Maps a compiled circuit, returning a CircuitImage, or None if there is no
+        cache or it was written from another source (digest) or by another version '''
+
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, byteorder, filedigest, sections = _HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        return None
+
+    if magic != MAGIC or version != VERSION or filedigest != digest or sections != SECTIONS \
+    or byteorder != (0 if sys.byteorder == 'little' else 1):
+        return None
+
+    return CircuitImage(buffer)
+
+if __name__ == "__main__":
+    pass
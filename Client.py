@@ -0,0 +1,86 @@
+import json
+import socket
+
+class Client:
+    ''' Blocking client of a Server, one request at a time, on a Unix socket
+        path or a (host, port) address. Failed requests raise RuntimeError '''
+
+    # Class constructor
+    def __init__(self, address):
+
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(address)
+
+        self.stream = self.socket.makefile('rwb')
+        self.requests = 0
+
+    def request(self, op, **fields):
+        ''' Sends a request and waits for its result '''
+
+        self.requests += 1
+        fields['id'] = self.requests
+        fields['op'] = op
+
+        self.stream.write((json.dumps(fields) + '\n').encode())
+        self.stream.flush()
+
+        line = self.stream.readline()
+        assert line, "[ERROR] SERVER CLOSED THE CONNECTION"
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+
+        return response['result']
+
+    def load(self, circuit):
+        ''' Loads a circuit (if it is not yet), returning its path, digest and
+            number of inputs '''
+
+        return self.request('load', circuit = circuit)
+
+    def apply(self, circuit, vectors):
+        ''' Applies a list of input vectors to a circuit '''
+
+        return self.request('apply', circuit = circuit, vectors = [int(vector) for vector in vectors])
+
+    def energy(self, circuit):
+        ''' Energy of the vectors applied to a circuit so far '''
+
+        return self.request('energy', circuit = circuit)['energy']
+
+    def reset(self, circuit):
+        ''' Resets the inputs information of a circuit '''
+
+        self.request('reset', circuit = circuit)
+
+    def sweep(self, circuit, sizes):
+        ''' Sweep results (as JSON) of the subsets of the given sizes '''
+
+        return self.request('sweep', circuit = circuit, sizes = list(sizes))
+
+    def unload(self, circuit):
+        ''' Drops a resident circuit '''
+
+        self.request('unload', circuit = circuit)
+
+    def circuits(self):
+        ''' Resident circuits '''
+
+        return self.request('circuits')
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+if __name__ == "__main__":
+    pass
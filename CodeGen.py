@@ -0,0 +1,171 @@
+import hashlib
+import importlib.util
+import os
+
+from BasicGates import NOTGate, ANDGate, ORGate, NANDGate, NORGate, MAJGate, BUFFERGate
+
+# Version of the generated code, part of the netlist hash
+VERSION = 2
+
+# Directory of the generated sources (Python keeps their bytecode beside them)
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'digitalenergy')
+
+# Builders of the netlists already generated by this process, by netlist hash
+_builders = {}
+
+def netlistHash(compiled):
+    ''' Hash of everything the generated code depends on: gate types and
+        widths, fanin nets and truth table indexes '''
+
+    netlist = (VERSION, compiled.nbitsInput, compiled.outputGate,\
+    [(type(gate).__name__, gate.nbitsInput, gate.nbitsOutput) for gate in compiled.gates],\
+    list(compiled.faninStart), list(compiled.faninNet), list(compiled.tableIndex))
+
+    return hashlib.sha256(repr(netlist).encode()).hexdigest()
+
+def generate(compiled, cacheDir = None):
+    ''' evaluate and localsOf functions of a compiled circuit, as straight-line
+        Python generated for its netlist. They behave as the CompiledCircuit
+        methods, but do not keep the net values. The code is generated once
+        per netlist and kept in memory and as a .py file in cacheDir
+        (CACHE_DIR by default) '''
+
+    digest = netlistHash(compiled)
+
+    if digest not in _builders:
+        _builders[digest] = _load(compiled, digest, cacheDir or CACHE_DIR)
+
+    return _builders[digest](compiled.tables, compiled.hist)
+
+def _load(compiled, digest, cacheDir):
+    ''' build function of the generated code of a netlist, from its file in
+        cacheDir (generating it first if needed) '''
+
+    name = 'circuit_' + digest
+    path = os.path.join(cacheDir, name + '.py')
+
+    try:
+        if not os.path.exists(path):
+            os.makedirs(cacheDir, exist_ok = True)
+
+            # Writes to a temporary file first, so readers never see half a file
+            temporary = path + '.' + str(os.getpid()) + '.tmp'
+            with open(temporary, 'w') as f:
+                f.write(generateSource(compiled, digest))
+            os.replace(temporary, path)
+
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        return module.build
+
+    # Not writable, the code only lives in memory
+    except OSError:
+        namespace = {}
+        exec(compile(generateSource(compiled, digest), name, 'exec'), namespace)
+
+        return namespace['build']
+
+def generateSource(compiled, digest = None):
+    ''' Source of a module with a build(tables, hist) function returning the
+        evaluate and localsOf functions of a compiled circuit. Nets are local
+        variables, basic gates are bit operations on them and any other gate
+        is a lookup on its truth table '''
+
+    nbitsInput = compiled.nbitsInput
+    tables = set()
+    evaluate = []
+    locals = []
+
+    # Inputs port
+    for i in range(0, nbitsInput):
+        line = 'n%d = input >> %d & 1' % (i, i) if i else 'n0 = input & 1'
+        evaluate.append(line)
+        locals.append(line)
+    evaluate.append('H0[input] += 1')
+
+    for k in range(1, len(compiled.gates)):
+        gate = compiled.gates[k]
+        fanins = ['n%d' % n for n in compiled.faninNet[compiled.faninStart[k]:compiled.faninStart[k+1]]]
+        outnet = compiled.netBase[k]
+
+        # Local input of the gate
+        local = ' | '.join(fanins[j] + (' << %d' % j if j else '') for j in range(0, len(fanins)))
+        evaluate.append('l = ' + local)
+        evaluate.append('H%d[l] += 1' % k)
+        locals.append('l%d = %s' % (k, local))
+
+        # The outputs port is a buffer, its local input is the circuit output
+        if k == compiled.outputGate:
+            evaluate.append('output = l')
+            continue
+
+        expression = _bitExpression(gate, fanins)
+        if expression != None:
+            evaluate.append('n%d = %s' % (outnet, expression))
+            locals.append('n%d = %s' % (outnet, expression))
+            continue
+
+        if isinstance(gate, BUFFERGate):
+            for bit in range(0, gate.nbitsOutput):
+                evaluate.append('n%d = %s' % (outnet + bit, fanins[bit]))
+                locals.append('n%d = %s' % (outnet + bit, fanins[bit]))
+            continue
+
+        # Truth table lookup
+        t = compiled.tableIndex[k]
+        tables.add(t)
+        if gate.nbitsOutput == 1:
+            evaluate.append('n%d = T%d[l]' % (outnet, t))
+            locals.append('n%d = T%d[l%d]' % (outnet, t, k))
+        else:
+            evaluate.append('o = T%d[l]' % t)
+            locals.append('o = T%d[l%d]' % (t, k))
+            for bit in range(0, gate.nbitsOutput):
+                evaluate.append('n%d = o >> %d & 1' % (outnet + bit, bit))
+                locals.append('n%d = o >> %d & 1' % (outnet + bit, bit))
+
+    evaluate.append('return output' if compiled.outputGate != None else 'return None')
+    locals.append('return [input, %s]' % ', '.join('l%d' % k for k in range(1, len(compiled.gates))))
+
+    lines = ['# Generated for netlist %s, do not edit' % digest if digest != None else '# Generated, do not edit', '']
+    lines.append('def build(tables, hist):')
+    lines.extend('    T%d = tables[%d]' % (t, t) for t in sorted(tables))
+    lines.extend('    H%d = hist[%d]' % (k, k) for k in range(0, len(compiled.gates)))
+    lines.append('')
+    lines.append('    def evaluate(input):')
+    lines.extend('        ' + line for line in evaluate)
+    lines.append('')
+    lines.append('    def localsOf(input):')
+    lines.extend('        ' + line for line in locals)
+    lines.append('')
+    lines.append('    return evaluate, localsOf')
+    lines.append('')
+
+    return '\n'.join(lines)
+
+def _bitExpression(gate, fanins):
+    ''' Output of a single output basic gate as bit operations on its fanin
+        nets, or None for other gates '''
+
+    kind = type(gate)
+
+    if kind is NOTGate and len(fanins) == 1:
+        return fanins[0] + ' ^ 1'
+    if kind is ANDGate:
+        return ' & '.join(fanins)
+    if kind is ORGate:
+        return ' | '.join(fanins)
+    if kind is NANDGate:
+        return '(%s) ^ 1' % ' & '.join(fanins)
+    if kind is NORGate:
+        return '(%s) ^ 1' % ' | '.join(fanins)
+    if kind is MAJGate and len(fanins) == 3:
+        a, b, c = fanins
+        return '%s & %s | %s & %s | %s & %s' % (a, b, a, c, b, c)
+
+    return None
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,120 @@
+from math import comb
+
+def revolvingDoor(n, t):
+    ''' Generates all t-combinations of range(n) as sorted tuples, in revolving-door
+        order: each combination differs from the previous one by removing one
+        element and adding another (Knuth, TAOCP 7.2.1.3, Algorithm R) '''
+
+    assert 0 <= t <= n, "[ERROR] INVALID COMBINATION SIZE"
+
+    # Trivial cases, not covered by algorithm R
+    if t == 0 or t == n:
+        yield tuple(range(0, t))
+        return
+
+    if t == 1:
+        for i in range(0, n):
+            yield (i,)
+        return
+
+    # c[1..t] are the elements (c[0] unused), c[t+1] is a sentinel
+    c = list(range(-1, t)) + [n]
+
+    while True:
+        yield tuple(c[1:t+1])
+
+        # Easy case
+        if t & 1:
+            if c[1] + 1 < c[2]:
+                c[1] += 1
+                continue
+            j = 2
+            decrease = True
+        else:
+            if c[1] > 0:
+                c[1] -= 1
+                continue
+            j = 2
+            decrease = False
+
+        while j <= t:
+
+            # Try to decrease c[j]
+            if decrease:
+                if c[j] >= j:
+                    c[j] = c[j-1]
+                    c[j-1] = j - 2
+                    break
+                j += 1
+
+            # Try to increase c[j]
+            if c[j] + 1 < c[j+1]:
+                c[j-1] = c[j]
+                c[j] += 1
+                break
+
+            j += 1
+            decrease = True
+        else:
+            return
+
+def unrankCombination(rank, n, t):
+    ''' The t-combination of range(n) at the given rank in lexicographic order
+        (combinatorial number system) '''
+
+    assert 0 <= rank < comb(n, t), "[ERROR] INVALID RANK (" + str(rank) + ")"
+
+    combination = []
+    x = 0
+
+    for i in range(0, t):
+
+        # Skips every combination starting with a smaller element
+        count = comb(n - 1 - x, t - 1 - i)
+        while rank >= count:
+            rank -= count
+            x += 1
+            count = comb(n - 1 - x, t - 1 - i)
+
+        combination.append(x)
+        x += 1
+
+    return tuple(combination)
+
+def rankCombination(combination, n):
+    ''' Rank of a sorted combination of range(n) in lexicographic order '''
+
+    t = len(combination)
+    rank = 0
+    x = 0
+
+    for i in range(0, t):
+        for y in range(x, combination[i]):
+            rank += comb(n - 1 - y, t - 1 - i)
+        x = combination[i] + 1
+
+    return rank
+
+def nextCombination(combination, n):
+    ''' The combination of range(n) following the given one in lexicographic
+        order, or None if it is the last one '''
+
+    t = len(combination)
+    combination = list(combination)
+
+    # Rightmost element that can still be increased
+    i = t - 1
+    while i >= 0 and combination[i] == n - t + i:
+        i -= 1
+
+    if i < 0:
+        return None
+
+    combination[i] += 1
+    for j in range(i + 1, t):
+        combination[j] = combination[j-1] + 1
+
+    return tuple(combination)
+
+if __name__ == "__main__":
+    pass
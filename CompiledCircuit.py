@@ -0,0 +1,797 @@
+from array import array
+from collections import deque
+from itertools import compress
+
+from time import perf_counter
+
+from LogicGate import SparseCounts, FunctionTable, newCounts
+from Module import MODULEGate
+from CodeGen import generate
+from Profile import Profile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Gates with up to this many input bits count their pending occurrences
+# on a list, wider ones on an array (see _pendingCounts)
+LIST_BITS = 8
+
+# Converts bytes holding 0 or 1 to ASCII '0' or '1'
+_BITS_TO_ASCII = bytes(range(48, 50)) + bytes(254)
+
+class CompiledCircuit:
+    ''' Levelized, flat representation of a LogicDiagram.
+        Every gate gets an integer id in level order and every gate output bit
+        gets an integer net id, so evaluating an input visits each gate once
+        without recursion or name lookups '''
+
+    # Class constructor
+    def __init__(self, ports, edges):
+
+        # Driver (port, output bit) of every input bit of every port
+        drivers = [[None]*p.nbitsInput for p in ports]
+        fanouts = [[] for _ in ports]
+
+        # Connections (origin, originBit, destinyBit, destiny), by origin and bit
+        for e in sorted(range(0, len(edges), 4), key = lambda e: (edges[e], edges[e+1])):
+            i, bit, inputbit, j = edges[e:e + 4]
+
+            # A input bit can only be driven once
+            assert drivers[j][inputbit] == None, \
+            "[ERROR] INPUT BIT " + str(inputbit) + " ON " + ports[j].name + " HAS MULTIPLE ORIGINS"
+
+            drivers[j][inputbit] = (i, bit)
+            fanouts[i].append(j)
+
+        # Levelizes the graph (Kahn), starting from the inputs port.
+        # Gates with undriven input bits never become ready, as they never
+        # had all their bits updated on the recursive propagation.
+        pending = [p.nbitsInput for p in ports]
+        level = [0]*len(ports)
+        order = []
+        queue = deque([0])
+
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+
+            for j in fanouts[i]:
+                level[j] = max(level[j], level[i] + 1)
+                pending[j] -= 1
+                if pending[j] == 0:
+                    queue.append(j)
+
+        order.sort(key=lambda i: level[i])
+
+        # Output nets and input nets of each gate, in level order
+        # (the inputs port is fed by the input vector)
+        compiledId = {}
+        netBase = []
+        nets = 0
+        faninStart = [0]
+        faninNet = []
+
+        # Interned truth tables
+        tables = []
+        tableIndex = []
+        tableIds = {}
+
+        for k in range(0, len(order)):
+            gate = ports[order[k]]
+            compiledId[order[k]] = k
+
+            netBase.append(nets)
+            nets += gate.nbitsOutput
+
+            if k != 0:
+                for (i, bit) in drivers[order[k]]:
+                    faninNet.append(netBase[compiledId[i]] + bit)
+            faninStart.append(len(faninNet))
+
+            table = _tableKey(gate)
+            if table not in tableIds:
+                tableIds[table] = len(tables)
+                tables.append(gate.truthTable if gate.isLazy() or isinstance(gate, MODULEGate) else tuple(gate.truthTable))
+            tableIndex.append(tableIds[table])
+
+        self._build(ports, order, [level[i] for i in order], faninStart, faninNet, tables, tableIndex)
+
+    @classmethod
+    def fromArrays(cls, ports, order, levels, faninStart, faninNet, tables, tableIndex):
+        ''' Creates a compiled circuit from already levelized arrays,
+            as returned by arrays(). They are kept as given, so the read only
+            memoryviews of a circuit cache are not copied. Only the truth
+            tables (one per distinct table) become tuples, the fastest to
+            look up '''
+
+        compiled = cls.__new__(cls)
+        compiled._build(ports, order, levels, faninStart, faninNet,\
+        [table if isinstance(table, FunctionTable) else tuple(table) for table in tables], tableIndex)
+
+        return compiled
+
+    def arrays(self):
+        ''' Levelized arrays of this circuit, as taken by fromArrays '''
+
+        return (self.portIndex, self.levels, self.faninStart, self.faninNet, self.tables, self.tableIndex)
+
+    def _build(self, ports, order, levels, faninStart, faninNet, tables, tableIndex):
+        ''' Sets every array from the level order, fanin nets and truth tables '''
+
+        # Flat arrays, indexed by compiled gate id
+        self.nbitsInput = ports[0].nbitsInput
+        self.portIndex = order
+        self.gates = [ports[i] for i in order]
+        self.levels = levels
+        self.netBase = []
+        self.faninStart = faninStart
+        self.faninNet = faninNet
+        self.tables = tables
+        self.tableIndex = tableIndex
+        self.histBase = []
+
+        nets = 0
+        hist = 0
+
+        # Compiled gate driving each net (the inputs port for the input bits)
+        self.netGate = []
+
+        # Compiled id of the outputs port (None if it never gets evaluated)
+        self.outputGate = None
+
+        for k in range(0, len(self.gates)):
+            gate = self.gates[k]
+            if order[k] == 1:
+                self.outputGate = k
+
+            # Output nets of this gate
+            self.netBase.append(nets)
+            nets += gate.nbitsOutput
+            self.netGate.extend([k]*gate.nbitsOutput)
+
+            # Offset of this gate in a histogram of every gate (see EnergyProfile)
+            self.histBase.append(hist)
+            hist += gate.getInputNum()
+
+        # Truth tables as NumPy arrays, created on first use
+        self._tableArrays = [None]*len(self.tables)
+
+        # Net values and pending occurrences of each gate, not yet added to
+        # the gates (see _pendingCounts)
+        self.nets = [0]*nets
+        self.hist = [_pendingCounts(gate.nbitsInput) for gate in self.gates]
+
+        # Evaluation of single inputs, 'table' (the program below) or
+        # 'pycodegen' (see enableCodegen)
+        self.backend = 'table'
+
+        # Per gate evaluation program (gates after the inputs port)
+        self.program = []
+        for k in range(1, len(order)):
+            fanins = tuple(self.faninNet[self.faninStart[k]:self.faninStart[k+1]])
+            self.program.append((fanins, self.tables[self.tableIndex[k]], self.hist[k],\
+            self.netBase[k], self.gates[k].nbitsOutput))
+
+    def evaluate(self, input):
+        ''' Evaluates an input, visiting each gate once in level order.
+            Returns the signal at the outputs port '''
+
+        net = self.nets
+
+        # Inputs port
+        for i in range(0, self.nbitsInput):
+            net[i] = (input >> i) & 1
+        self.hist[0][input] += 1
+
+        for fanins, table, counts, outnet, nbitsOutput in self.program:
+
+            # Local input of the gate
+            local = 0
+            shift = 0
+            for n in fanins:
+                local |= net[n] << shift
+                shift += 1
+
+            # New input occurence
+            counts[local] += 1
+
+            # Applies the signal to the output nets
+            output = table[local]
+            if nbitsOutput == 1:
+                net[outnet] = output
+            else:
+                for bit in range(0, nbitsOutput):
+                    net[outnet + bit] = (output >> bit) & 1
+
+        # The outputs port is a buffer, so its signal is its local input
+        if self.outputGate == None:
+            return None
+
+        return self._localInput(self.outputGate)
+
+    def localsOf(self, input):
+        ''' Local input of every gate for the given input, without counting it '''
+
+        net = self.nets
+        locals = [input]
+
+        for i in range(0, self.nbitsInput):
+            net[i] = (input >> i) & 1
+
+        for fanins, table, counts, outnet, nbitsOutput in self.program:
+
+            local = 0
+            shift = 0
+            for n in fanins:
+                local |= net[n] << shift
+                shift += 1
+            locals.append(local)
+
+            output = table[local]
+            if nbitsOutput == 1:
+                net[outnet] = output
+            else:
+                for bit in range(0, nbitsOutput):
+                    net[outnet + bit] = (output >> bit) & 1
+
+        return locals
+
+    def evaluateWords(self, words, count):
+        ''' Evaluates count inputs at once, bit-parallel. words has one word
+            per circuit input bit, where bit j of word i is bit i of input j.
+            Returns one word per output, in the same layout '''
+
+        mask = (1 << count) - 1
+        net = [0]*len(self.nets)
+        net[0:self.nbitsInput] = words
+
+        for k in range(0, len(self.gates)):
+            gate = self.gates[k]
+            counts = self.hist[k]
+
+            # Words at the inputs of the gate
+            if k == 0:
+                fanins = words
+            else:
+                fanins = [net[n] for n in self.faninNet[self.faninStart[k]:self.faninStart[k+1]]]
+
+            # Counts occurrences of each input combination (only the
+            # occurring ones on sparse gates)
+            if gate.isSparse():
+                for i, term in gate._observedMinterms(fanins, mask).items():
+                    counts[i] += term.bit_count()
+            else:
+                terms = gate._minterms(fanins, mask)
+                for i in range(0, len(terms)):
+                    if terms[i]:
+                        counts[i] += terms[i].bit_count()
+
+            # Applies the signal to the output nets
+            if k != 0:
+                outnet = self.netBase[k]
+                net[outnet:outnet + gate.nbitsOutput] = gate._evaluateWords(fanins, mask)
+
+        # The outputs port is a buffer, so its words are its input words
+        if self.outputGate == None:
+            return None
+
+        return [net[n] for n in self.faninNet[self.faninStart[self.outputGate]:self.faninStart[self.outputGate+1]]]
+
+    def faninWords(self, words, mask):
+        ''' Evaluates one word per input bit through every gate, without
+            counting occurrences. Words may be ints or anything with the same
+            bitwise operators (as BDD functions), mask having every bit set.
+            Yields, in level order, each compiled gate id (but the inputs port)
+            with the words at its inputs '''
+
+        net = [0]*len(self.nets)
+        net[0:self.nbitsInput] = words
+
+        for k in range(1, len(self.gates)):
+            fanins = [net[n] for n in self.faninNet[self.faninStart[k]:self.faninStart[k+1]]]
+
+            yield k, fanins
+
+            outnet = self.netBase[k]
+            net[outnet:outnet + self.gates[k].nbitsOutput] = self.gates[k]._evaluateWords(fanins, mask)
+
+    def propagateWords(self, words, mask):
+        ''' As faninWords, returning only the words at the outputs port '''
+
+        outputs = None
+
+        for k, fanins in self.faninWords(words, mask):
+            if k == self.outputGate:
+                outputs = fanins
+
+        return outputs
+
+    def localInputs(self, vectors):
+        ''' Evaluates a NumPy array of inputs. Yields, in level order, each
+            compiled gate id with the array of its local inputs '''
+
+        lastUse = self._lastUse()
+        net = [None]*len(self.nets)
+
+        # Inputs port
+        for i in range(0, self.nbitsInput):
+            net[i] = ((vectors >> i) & 1).astype(np.uint8)
+        yield 0, vectors
+
+        for k in range(1, len(self.gates)):
+            gate = self.gates[k]
+            fanins = self.faninNet[self.faninStart[k]:self.faninStart[k+1]]
+
+            # Local input of the gate
+            local = net[fanins[0]].astype(_localType(len(fanins)))
+            for j in range(1, len(fanins)):
+                local |= net[fanins[j]].astype(local.dtype) << j
+
+            for n in fanins:
+                if lastUse[n] == k:
+                    net[n] = None
+
+            yield k, local
+
+            # Applies the signal to the output nets
+            table = self._lookup(self.tableIndex[k], local)
+            outnet = self.netBase[k]
+            if gate.nbitsOutput == 1:
+                net[outnet] = table.astype(np.uint8)
+            else:
+                for bit in range(0, gate.nbitsOutput):
+                    net[outnet + bit] = ((table >> bit) & 1).astype(np.uint8)
+
+    def _lastUse(self):
+        ''' Last gate reading each net, so net arrays can be dropped early '''
+
+        lastUse = [0]*len(self.nets)
+        for k in range(1, len(self.gates)):
+            for n in self.faninNet[self.faninStart[k]:self.faninStart[k+1]]:
+                lastUse[n] = k
+
+        return lastUse
+
+    def evaluateArray(self, vectors):
+        ''' Evaluates a NumPy array of inputs, counting occurrences with bincount.
+            Returns the array of signals at the outputs port '''
+
+        outputs = None
+
+        for k, local in self.localInputs(vectors):
+            self._countArray(k, local)
+
+            if k == self.outputGate:
+                outputs = local
+
+        return outputs
+
+    def _countArray(self, k, local):
+        ''' Adds the occurrences of an array of local inputs of gate k '''
+
+        pending = self.hist[k]
+
+        # Occurrences of each input combination of the gate
+        if isinstance(pending, SparseCounts):
+            values, counts = np.unique(local, return_counts = True)
+            for i, count in zip(values.tolist(), counts.tolist()):
+                pending[i] += count
+        elif isinstance(pending, array):
+            counts = np.bincount(local.astype(np.intp))
+            np.frombuffer(pending, dtype = np.uint64)[0:len(counts)] += counts.astype(np.uint64)
+        else:
+            counts = np.bincount(local.astype(np.intp))
+            for i in np.flatnonzero(counts).tolist():
+                pending[i] += int(counts[i])
+
+    def _lookup(self, t, local):
+        ''' Outputs of truth table t for a NumPy array of local inputs '''
+
+        if isinstance(self.tables[t], FunctionTable):
+            return self.tables[t].function(local.astype(np.uint64))
+
+        return self._tableArray(t)[local]
+
+    def _tableArray(self, t):
+        ''' Truth table as a NumPy array '''
+
+        if self._tableArrays[t] is None:
+            self._tableArrays[t] = np.array(self.tables[t], dtype = np.uint64 if max(self.tables[t]) >> 63 == 0 else object)
+
+        return self._tableArrays[t]
+
+    def packInputs(self, inputs):
+        ''' Transposes a list of inputs to one word per input bit '''
+        return packInputs(inputs, self.nbitsInput)
+
+    def exhaustiveWords(self, start, count):
+        ''' Words for the count inputs from start on, where count is a power of two
+            and start a multiple of count '''
+
+        mask = (1 << count) - 1
+        words = []
+
+        for i in range(0, self.nbitsInput):
+            period = 1 << i
+            if period < count:
+                # Blocks of period zeros followed by period ones
+                words.append((mask // ((1 << period) + 1)) << period)
+            elif (start >> i) & 1:
+                words.append(mask)
+            else:
+                words.append(0)
+
+        return words
+
+    def _localInput(self, k):
+        ''' Local input of a gate from current net values '''
+
+        local = 0
+        for j in range(self.faninStart[k], self.faninStart[k+1]):
+            local |= self.nets[self.faninNet[j]] << (j - self.faninStart[k])
+
+        return local
+
+    def flush(self):
+        ''' Adds pending occurrences to the gates, visiting only the observed
+            entries (found by NumPy, or by compress, on dense gates) '''
+
+        for k in range(0, len(self.gates)):
+            gate = self.gates[k]
+            pending = self.hist[k]
+
+            if isinstance(pending, SparseCounts):
+                for local, ocurrences in pending.items():
+                    self._addOccurrences(gate, local, ocurrences)
+                pending.clear()
+
+            elif np != None and isinstance(pending, array):
+                self._flushArray(k)
+
+            else:
+                for local in list(compress(range(0, len(pending)), pending)):
+                    self._addOccurrences(gate, local, pending[local])
+                    pending[local] = 0
+
+    def _flushArray(self, k):
+        ''' Adds the pending occurrences of a gate kept in an array, with NumPy '''
+
+        pending = np.frombuffer(self.hist[k], dtype = np.uint64)
+        observed = np.flatnonzero(pending)
+        if len(observed) == 0:
+            return
+
+        ocurrences = pending[observed]
+        pending[observed] = 0
+
+        gate = self.gates[k]
+        gate.inputsOcurrNum += int(ocurrences.sum())
+        outputs = self._lookup(self.tableIndex[k], observed)
+
+        if isinstance(gate.occurrences, array):
+            np.frombuffer(gate.occurrences, dtype = np.uint64)[observed] += ocurrences
+        else:
+            for local, c in zip(observed.tolist(), ocurrences.tolist()):
+                gate.occurrences[local] += c
+
+        if isinstance(gate.outputOccurr, array):
+            np.add.at(np.frombuffer(gate.outputOccurr, dtype = np.uint64), outputs.astype(np.intp), ocurrences)
+        else:
+            for output, c in zip(outputs.tolist(), ocurrences.tolist()):
+                gate.outputOccurr[output] += c
+
+    @staticmethod
+    def _addOccurrences(gate, local, ocurrences):
+        ''' Adds occurrences of a local input to a gate '''
+
+        gate.occurrences[local] += ocurrences
+        gate.inputsOcurrNum += ocurrences
+        gate.outputOccurr[gate.truthTable[local]] += ocurrences
+
+    def reset(self):
+        ''' Discards pending occurrences. Histograms are cleared in place, as
+            the evaluation program refers to them '''
+
+        for k in range(0, len(self.gates)):
+            pending = self.hist[k]
+
+            if isinstance(pending, SparseCounts):
+                pending.clear()
+            elif np != None and isinstance(pending, array):
+                np.frombuffer(pending, dtype = np.uint64).fill(0)
+            else:
+                pending[:] = _pendingCounts(self.gates[k].nbitsInput)
+
+    def enableCodegen(self):
+        ''' Replaces evaluate and localsOf on this instance by straight-line
+            Python generated for this netlist (see CodeGen). They do not keep
+            the net values '''
+
+        self.backend = 'pycodegen'
+        self.evaluate, self.localsOf = generate(self)
+
+    def __getstate__(self):
+        ''' Attributes to pickle, without the generated or profiled methods
+            (generated code is loaded again, profiling is left off) '''
+
+        state = dict(self.__dict__)
+        for name in ('evaluate', 'localsOf', 'evaluateWords', 'evaluateArray', 'flush', 'profile'):
+            state.pop(name, None)
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if self.backend == 'pycodegen':
+            self.enableCodegen()
+
+    def enableProfile(self):
+        ''' Starts counting evaluations, net events and phase times (see Profile).
+            The profiled methods replace the usual ones on this instance only,
+            so circuits not being profiled pay nothing for it '''
+
+        self.profile = Profile(self)
+
+        self.evaluate = self._evaluateProfiled
+        self.localsOf = self._localsOfProfiled
+        self.evaluateWords = self._evaluateWordsProfiled
+        self.evaluateArray = self._evaluateArrayProfiled
+        self.flush = self.profile.timed(CompiledCircuit.flush.__get__(self), 'accounting')
+
+        return self.profile
+
+    def _evaluateProfiled(self, input):
+        ''' evaluate, counting and timing each gate '''
+
+        profile = self.profile
+        net = self.nets
+        events = profile.events
+        propagate = update = accounting = 0.0
+
+        start = perf_counter()
+        for i in range(0, self.nbitsInput):
+            bit = (input >> i) & 1
+            events[i] += net[i] ^ bit
+            net[i] = bit
+        self.hist[0][input] += 1
+        profile.evaluations[0] += 1
+        profile.gateTime[0] += perf_counter() - start
+
+        k = 1
+        for fanins, table, counts, outnet, nbitsOutput in self.program:
+            t0 = perf_counter()
+
+            local = 0
+            shift = 0
+            for n in fanins:
+                local |= net[n] << shift
+                shift += 1
+            output = table[local]
+
+            t1 = perf_counter()
+            counts[local] += 1
+            t2 = perf_counter()
+
+            for bit in range(0, nbitsOutput):
+                value = (output >> bit) & 1
+                events[outnet + bit] += net[outnet + bit] ^ value
+                net[outnet + bit] = value
+
+            t3 = perf_counter()
+            propagate += t1 - t0
+            accounting += t2 - t1
+            update += t3 - t2
+            profile.evaluations[k] += 1
+            profile.gateTime[k] += t3 - t0
+            k += 1
+
+        profile.times['propagate'] += propagate
+        profile.times['update'] += update
+        profile.times['accounting'] += accounting
+
+        if self.outputGate == None:
+            return None
+
+        return self._localInput(self.outputGate)
+
+    def _localsOfProfiled(self, input):
+        ''' localsOf, counting and timing each gate '''
+
+        profile = self.profile
+        net = self.nets
+        events = profile.events
+        locals = [input]
+        propagate = update = 0.0
+
+        for i in range(0, self.nbitsInput):
+            bit = (input >> i) & 1
+            events[i] += net[i] ^ bit
+            net[i] = bit
+        profile.evaluations[0] += 1
+
+        k = 1
+        for fanins, table, counts, outnet, nbitsOutput in self.program:
+            t0 = perf_counter()
+
+            local = 0
+            shift = 0
+            for n in fanins:
+                local |= net[n] << shift
+                shift += 1
+            locals.append(local)
+            output = table[local]
+
+            t1 = perf_counter()
+
+            for bit in range(0, nbitsOutput):
+                value = (output >> bit) & 1
+                events[outnet + bit] += net[outnet + bit] ^ value
+                net[outnet + bit] = value
+
+            t2 = perf_counter()
+            propagate += t1 - t0
+            update += t2 - t1
+            profile.evaluations[k] += 1
+            profile.gateTime[k] += t2 - t0
+            k += 1
+
+        profile.times['propagate'] += propagate
+        profile.times['update'] += update
+
+        return locals
+
+    def _evaluateWordsProfiled(self, words, count):
+        ''' evaluateWords, counting and timing each gate. The events of a net
+            are the changes between consecutive inputs of its words '''
+
+        profile = self.profile
+        mask = (1 << count) - 1
+        net = [0]*len(self.nets)
+        net[0:self.nbitsInput] = words
+
+        for k in range(0, len(self.gates)):
+            gate = self.gates[k]
+            counts = self.hist[k]
+            t0 = perf_counter()
+
+            if k == 0:
+                fanins = words
+            else:
+                fanins = [net[n] for n in self.faninNet[self.faninStart[k]:self.faninStart[k+1]]]
+
+            if gate.isSparse():
+                for i, term in gate._observedMinterms(fanins, mask).items():
+                    counts[i] += term.bit_count()
+            else:
+                terms = gate._minterms(fanins, mask)
+                for i in range(0, len(terms)):
+                    if terms[i]:
+                        counts[i] += terms[i].bit_count()
+
+            t1 = perf_counter()
+            outnet = self.netBase[k]
+            if k != 0:
+                net[outnet:outnet + gate.nbitsOutput] = gate._evaluateWords(fanins, mask)
+
+            t2 = perf_counter()
+            for n in range(outnet, outnet + gate.nbitsOutput):
+                word = net[n]
+                profile.events[n] += ((word ^ (word >> 1)) & (mask >> 1)).bit_count() + ((word ^ self.nets[n]) & 1)
+                self.nets[n] = (word >> (count - 1)) & 1
+
+            t3 = perf_counter()
+            profile.times['accounting'] += t1 - t0
+            profile.times['propagate'] += t2 - t1
+            profile.times['update'] += t3 - t2
+            profile.evaluations[k] += count
+            profile.gateTime[k] += t3 - t0
+
+        if self.outputGate == None:
+            return None
+
+        return [net[n] for n in self.faninNet[self.faninStart[self.outputGate]:self.faninStart[self.outputGate+1]]]
+
+    def _evaluateArrayProfiled(self, vectors):
+        ''' evaluateArray, counting and timing each gate. The events of a net
+            are the changes between consecutive inputs of the array '''
+
+        if len(vectors) == 0:
+            return CompiledCircuit.evaluateArray(self, vectors)
+
+        profile = self.profile
+        lastUse = self._lastUse()
+        net = [None]*len(self.nets)
+        outputs = None
+
+        for k in range(0, len(self.gates)):
+            gate = self.gates[k]
+            outnet = self.netBase[k]
+            t0 = perf_counter()
+
+            # Local input and outputs of the gate, the inputs port outputs
+            # being the vectors themselves
+            if k == 0:
+                local = output = vectors
+            else:
+                fanins = self.faninNet[self.faninStart[k]:self.faninStart[k+1]]
+                local = net[fanins[0]].astype(_localType(len(fanins)))
+                for j in range(1, len(fanins)):
+                    local |= net[fanins[j]].astype(local.dtype) << j
+
+                for n in fanins:
+                    if lastUse[n] == k:
+                        net[n] = None
+
+                output = self._lookup(self.tableIndex[k], local)
+
+            t1 = perf_counter()
+            self._countArray(k, local)
+            if k == self.outputGate:
+                outputs = local
+
+            t2 = perf_counter()
+            for bit in range(0, gate.nbitsOutput):
+                n = outnet + bit
+                value = output.astype(np.uint8) if gate.nbitsOutput == 1 and k != 0 else ((output >> bit) & 1).astype(np.uint8)
+                profile.events[n] += int(np.count_nonzero(value[1:] != value[:-1])) + (int(value[0]) != self.nets[n])
+                self.nets[n] = int(value[-1])
+                net[n] = value
+
+            t3 = perf_counter()
+            profile.times['propagate'] += t1 - t0
+            profile.times['accounting'] += t2 - t1
+            profile.times['update'] += t3 - t2
+            profile.evaluations[k] += len(vectors)
+            profile.gateTime[k] += t3 - t0
+
+        return outputs
+
+def packInputs(inputs, nbits):
+    ''' Transposes a list of inputs of nbits bits to one word per input bit,
+        bit j of word i being bit i of input j '''
+
+    words = []
+    for i in range(0, nbits):
+        bits = bytes([(input >> i) & 1 for input in inputs])
+        words.append(int(bits[::-1].translate(_BITS_TO_ASCII) or b'0', 2))
+
+    return words
+
+def _pendingCounts(nbits):
+    ''' Pending occurrences of a gate with nbits input bits, all 0. Narrow
+        gates keep them in a list, the fastest to count on, wider ones in an
+        array that NumPy flushes at once and the widest only the observed ones '''
+
+    if nbits <= LIST_BITS:
+        return [0]*(1 << nbits)
+
+    return newCounts(nbits)
+
+def _tableKey(gate):
+    ''' Interning key of the truth table of a gate. Lazy tables of the same
+        gate type and width compute the same outputs, instances of the same
+        module share its table and stored tables are interned (see
+        LogicGate.internTable), so equal tables are mostly the same object '''
+
+    if isinstance(gate, MODULEGate):
+        return ('module', id(gate.module))
+
+    if gate.isLazy():
+        return (type(gate).__name__, gate.nbitsInput, gate.nbitsOutput)
+
+    return id(gate.truthTable)
+
+def _localType(nbits):
+    ''' Smallest unsigned NumPy type for a local input of nbits '''
+
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if nbits <= np.iinfo(dtype).bits:
+            return dtype
+
+    return np.uint64
+
+if __name__ == "__main__":
+    pass
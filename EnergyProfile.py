@@ -0,0 +1,102 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from LogicGate import entropySum
+from Module import MODULEGate
+
+class EnergyProfile:
+    ''' Local input of every gate for every primary input of a compiled circuit.
+        As the circuit is deterministic, the energy of any multiset of primary
+        inputs is a gather of this table followed by the entropies, with no
+        propagation at all. The table has (gates x 2^nbitsInput) entries,
+        so it is meant for circuits with few inputs '''
+
+    # Class constructor
+    def __init__(self, compiled):
+
+        assert np != None, "[ERROR] NUMPY IS REQUIRED FOR EnergyProfile"
+
+        self.compiled = compiled
+
+        # Built on first use
+        self.locals = None
+        self.outputs = None
+        self._inputIndex = None
+        self._outputIndex = None
+
+    def build(self):
+        ''' Builds the table (gate x primary input -> local input), if not built yet '''
+
+        if self.locals is not None:
+            return self
+
+        compiled = self.compiled
+        ngates = len(compiled.gates)
+        ninputs = 1 << compiled.nbitsInput
+
+        # Global offsets of each gate input and output histogram
+        outBase = [0]*ngates
+        for k in range(1, ngates):
+            outBase[k] = outBase[k-1] + compiled.gates[k-1].getOutputNum()
+        self.histSize = compiled.histBase[-1] + compiled.gates[-1].getInputNum()
+        self.outputSize = outBase[-1] + compiled.gates[-1].getOutputNum()
+        self._outBase = outBase
+
+        indexType = np.int32 if max(self.histSize, self.outputSize) < (1 << 31) else np.int64
+        self.locals = np.empty((ngates, ninputs), dtype = np.int64)
+        self._inputIndex = np.empty((ngates, ninputs), dtype = indexType)
+        self._outputIndex = np.empty((ngates, ninputs), dtype = indexType)
+
+        for k, local in compiled.localInputs(np.arange(ninputs, dtype = np.int64)):
+            self.locals[k] = local
+            self._inputIndex[k] = compiled.histBase[k] + local.astype(np.int64)
+            self._outputIndex[k] = outBase[k] + compiled._lookup(compiled.tableIndex[k], local).astype(np.int64)
+
+            # Circuit output of each primary input
+            if k == compiled.outputGate:
+                self.outputs = self.locals[k]
+
+        return self
+
+    def histograms(self, counts):
+        ''' Input and output occurrences of every gate (flat, in compiled order)
+            for the given number of occurrences of each primary input '''
+
+        self.build()
+
+        counts = np.asarray(counts, dtype = np.float64)
+        assert counts.shape == (self.locals.shape[1],), "[ERROR] INVALID SIZE FOR COUNTS"
+
+        weights = np.broadcast_to(counts, self.locals.shape).ravel()
+        inputs = np.bincount(self._inputIndex.ravel(), weights = weights, minlength = self.histSize)
+        outputs = np.bincount(self._outputIndex.ravel(), weights = weights, minlength = self.outputSize)
+
+        return inputs, outputs
+
+    def energyOf(self, counts):
+        ''' Energy of the circuit for the given number of occurrences of each
+            primary input, as LogicDiagram.calculateEnergy would give after
+            applying them '''
+
+        total = float(np.sum(counts))
+        if total == 0:
+            return 0.0
+
+        inputs, outputs = self.histograms(counts)
+        energy = entropySum(outputs) - entropySum(inputs)
+
+        # Module instances give the energy of the gates inside them instead
+        compiled = self.compiled
+        for k in range(0, len(compiled.gates)):
+            gate = compiled.gates[k]
+            if isinstance(gate, MODULEGate):
+                local = inputs[compiled.histBase[k]:compiled.histBase[k] + gate.getInputNum()]
+                output = outputs[self._outBase[k]:self._outBase[k] + gate.getOutputNum()]
+                energy += total*gate.energyOf(local) - (entropySum(output) - entropySum(local))
+
+        return float(energy/total)
+
+if __name__ == "__main__":
+    pass
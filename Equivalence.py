@@ -0,0 +1,66 @@
+from BDD import BDD
+
+# Circuits with up to this many inputs are compared on every input
+EXHAUSTIVE_BITS = 20
+
+# Inputs evaluated at once (one per word bit) by the exhaustive comparison
+_WIDTH = 1 << 16
+
+def equivalent(diagA, diagB, exhaustiveBits = EXHAUSTIVE_BITS):
+    ''' Checks whether two circuits give the same outputs for every input,
+        matching inputs and outputs by name. Circuits with few inputs are
+        simulated on every input, bit-parallel, wider ones are compared with
+        BDDs. Returns (True, None), or (False, counterexample) with an input
+        (in the bit order of diagA inputs) where some output differs '''
+
+    assert sorted(diagA.inputNames) == sorted(diagB.inputNames), "[ERROR] CIRCUITS HAVE DIFFERENT INPUTS"
+    assert sorted(diagA.outputNames) == sorted(diagB.outputNames), "[ERROR] CIRCUITS HAVE DIFFERENT OUTPUTS"
+
+    compiledA = diagA.compile()
+    compiledB = diagB.compile()
+
+    assert compiledA.outputGate != None and compiledB.outputGate != None, "[ERROR] OUTPUTS NOT CONNECTED"
+
+    # Input bit of diagA feeding each input bit of diagB, and
+    # output bit of diagB matching each output bit of diagA
+    inputOf = [diagA.inputIds[name] for name in diagB.inputNames]
+    outputOf = [diagB.outputIds[name] for name in diagA.outputNames]
+
+    def differences(words, mask):
+        ''' Words (or functions) set where any output differs '''
+
+        outputsA = compiledA.propagateWords(words, mask)
+        outputsB = compiledB.propagateWords([words[i] for i in inputOf], mask)
+
+        difference = 0
+        for i in range(0, len(outputsA)):
+            difference |= outputsA[i] ^ outputsB[outputOf[i]]
+
+        return difference
+
+    nbitsInput = diagA.nbitsInput
+
+    # Every input, as applyAllInputs
+    if nbitsInput <= exhaustiveBits:
+        total = 1 << nbitsInput
+        count = min(total, _WIDTH)
+
+        for start in range(0, total, count):
+            difference = differences(compiledA.exhaustiveWords(start, count), (1 << count) - 1)
+
+            if difference:
+                return False, start + (difference & -difference).bit_length() - 1
+
+        return True, None
+
+    # Output functions, on one variable per input of diagA
+    bdd = BDD(nbitsInput)
+    difference = differences([bdd.variable(i) for i in range(0, nbitsInput)], bdd.constant(1))
+
+    if difference:
+        return False, difference.satisfy()
+
+    return True, None
+
+if __name__ == "__main__":
+    pass
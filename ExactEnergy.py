@@ -0,0 +1,94 @@
+from math import log2
+
+from BDD import BDD, CACHE_BITS
+from Module import MODULEGate
+
+def inputOrder(compiled, ordering = 'dfs'):
+    ''' Input bits of a compiled circuit in BDD variable order. 'input' keeps
+        the input bit order. 'dfs' takes them as a depth first search from the
+        outputs reaches them, so inputs of the same cone end up close together '''
+
+    nbitsInput = compiled.nbitsInput
+
+    if ordering == 'input':
+        return list(range(0, nbitsInput))
+
+    assert ordering == 'dfs', "[ERROR] INVALID VARIABLE ORDERING (" + str(ordering) + ")"
+
+    order = []
+    seen = set()
+    visited = set()
+
+    # Iterative DFS over fanin nets, in fanin order
+    start = compiled.outputGate if compiled.outputGate != None else len(compiled.gates) - 1
+    stack = [start]
+    while stack:
+        k = stack.pop()
+        if k in visited:
+            continue
+        visited.add(k)
+
+        fanins = compiled.faninNet[compiled.faninStart[k]:compiled.faninStart[k+1]]
+        for n in reversed(fanins):
+            if n < nbitsInput:
+                continue
+            stack.append(compiled.netGate[n])
+
+        # Inputs read by this gate, before the ones of its fanin gates
+        for n in fanins:
+            if n < nbitsInput and n not in seen:
+                seen.add(n)
+                order.append(n)
+
+    # Inputs not reaching the outputs
+    order.extend(i for i in range(0, nbitsInput) if i not in seen)
+
+    return order
+
+def exactEnergy(compiled, ordering = 'dfs', cacheBits = CACHE_BITS):
+    ''' Energy of a compiled circuit over every input once, as calculateEnergy
+        gives after applyAllInputs, without applying them. Each gate local input
+        occurrences are the number of inputs satisfying the BDDs of its fanins '''
+
+    nbitsInput = compiled.nbitsInput
+    order = inputOrder(compiled, ordering)
+
+    bdd = BDD(nbitsInput, cacheBits)
+    words = [None]*nbitsInput
+    for position in range(0, nbitsInput):
+        words[order[position]] = bdd.variable(position)
+
+    # The inputs port sees every input once, giving 0 on both sides
+    total = 1 << nbitsInput
+    energy = 0.0
+
+    for k, fanins in compiled.faninWords(words, bdd.constant(1)):
+        gate = compiled.gates[k]
+        table = gate.truthTable
+
+        # Module instances give the energy of the gates inside them
+        if isinstance(gate, MODULEGate):
+            counts = [0]*gate.getInputNum()
+            for local, function in gate._observedMinterms(fanins, bdd.constant(1)).items():
+                counts[local] = function.count()
+            energy += gate.energyOf(counts)
+            continue
+
+        # Input and output occurrences of the gate
+        inputSum = 0.0
+        outputs = {}
+        for local, function in gate._observedMinterms(fanins, bdd.constant(1)).items():
+            ocurrences = function.count()
+            inputSum += ocurrences/total*log2(ocurrences)
+
+            output = table[local]
+            outputs[output] = outputs.get(output, 0) + ocurrences
+
+        outputSum = sum(ocurrences/total*log2(ocurrences) for ocurrences in outputs.values())
+
+        energy += outputSum - inputSum
+
+    return energy
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,235 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from CompiledCircuit import packInputs
+from LogicDiagram import readCircuitJSON
+from Trace import windows
+
+# Ways of running the members of a group: on the calling thread, on a
+# thread pool or on one process each
+POOLS = (None, 'thread', 'process')
+
+# Inputs packed per word, without NumPy
+WIDTH = 4096
+
+# Circuit of this process, for groups on processes
+_member = {}
+
+class CircuitGroup:
+    ''' Circuits (netlist variants of the same function) evaluated in lockstep
+        on the same vectors. Each batch is decoded once and applied to every
+        member, optionally comparing their outputs with the first one, and the
+        energy of each member is kept apart. Inputs and outputs are matched by
+        name, as in Equivalence, so members may order them differently.
+
+            group = CircuitGroup(['circuit2.json', 'circuit3.json'], compare = True)
+            group.apply(vectors)
+            group.energies(), group.mismatches
+
+        Members run one after the other, on a thread pool (NumPy evaluation
+        partly runs in parallel) or each on its own process, which then needs
+        circuit files instead of loaded circuits '''
+
+    # Class constructor
+    def __init__(self, circuits, compare = False, pool = None, workers = None):
+
+        assert circuits, "[ERROR] EMPTY CIRCUIT GROUP"
+        assert pool in POOLS, "[ERROR] UNKNOWN POOL (" + str(pool) + ")"
+
+        self.compare = compare
+        self.pool = pool
+        self.names = [c if isinstance(c, str) else c.circuitname for c in circuits]
+        self.circuits = None
+        self.executors = None
+
+        if pool == 'process':
+            assert all(isinstance(c, str) for c in circuits), "[ERROR] PROCESS POOL NEEDS CIRCUIT FILES"
+
+            # One process per member, so each keeps its circuit loaded
+            self.executors = [ProcessPoolExecutor(1, initializer = _initMember, initargs = (c,)) for c in circuits]
+        else:
+            self.circuits = [readCircuitJSON(c) if isinstance(c, str) else c for c in circuits]
+            if pool == 'thread':
+                self.executors = ThreadPoolExecutor(workers or len(circuits))
+
+        ports = self._each(_ports)
+        inputNames, outputNames = ports[0]
+
+        for inputs, outputs in ports:
+            assert sorted(inputs) == sorted(inputNames), "[ERROR] CIRCUITS HAVE DIFFERENT INPUTS"
+            assert not compare or sorted(outputs) == sorted(outputNames), "[ERROR] CIRCUITS HAVE DIFFERENT OUTPUTS"
+
+        # Input bit of the first member feeding each input bit of every member,
+        # and output bit of every member matching each output bit of the first
+        # one (None when they are in the same order)
+        self.inputOf = [_order(inputNames, inputs) for inputs, _ in ports]
+        self.outputOf = [_order(outputs, outputNames) if compare else None for _, outputs in ports]
+
+        self.nbitsInput = len(inputNames)
+        self.applied = 0
+
+        # Vectors where each member output differs from the first member and
+        # the first of them, as (vector number, input, expected, output)
+        self.mismatches = [0]*len(circuits)
+        self.firstMismatch = [None]*len(circuits)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _each(self, task, *args):
+        ''' Results of task(circuit, *args) on every member, in order '''
+        return self._eachOf(task, [args]*len(self))
+
+    def _eachOf(self, task, args):
+        ''' Results of task(circuit, *args[k]) on every member k, in order '''
+
+        if self.pool == None:
+            return [task(self.circuits[k], *args[k]) for k in range(0, len(self))]
+
+        if self.pool == 'thread':
+            futures = [self.executors.submit(task, self.circuits[k], *args[k]) for k in range(0, len(self))]
+        else:
+            futures = [self.executors[k].submit(_onMember, task, *args[k]) for k in range(0, len(self))]
+
+        return [future.result() for future in futures]
+
+    def apply(self, vectors):
+        ''' Applies a list or array of vectors to every member '''
+
+        # Decoded once for all members, as an array or, when they do not fit
+        # on NumPy, as words of packed input bits
+        if np != None and self.nbitsInput <= 63:
+            vectors = np.asarray(vectors, dtype = np.uint64)
+
+            # Members with other input orders get their own permuted vectors
+            outputs = self._eachOf(_applyArray, [(vectors if self.inputOf[k] == None else\
+            _permute(vectors, self.inputOf[k]), self.compare) for k in range(0, len(self))])
+        else:
+            vectors = [int(vector) for vector in vectors]
+            assert all(0 <= vector < 1 << self.nbitsInput for vector in vectors), "[ERROR] INVALID INPUT"
+            packed = [packInputs(vectors[start:start+WIDTH], self.nbitsInput) for start in range(0, len(vectors), WIDTH)]
+
+            # Members with other input orders get the words in their order
+            outputs = self._eachOf(_applyWords, [(vectors, packed if self.inputOf[k] == None else\
+            [[words[i] for i in self.inputOf[k]] for words in packed], self.compare) for k in range(0, len(self))])
+
+        if self.compare:
+            self._compare(vectors, outputs)
+
+        self.applied += len(vectors)
+
+    def _compare(self, vectors, outputs):
+        ''' Counts the vectors where each member output differs from the first '''
+
+        reference = outputs[0]
+        if reference is None:
+            return
+
+        for k in range(1, len(outputs)):
+            if self.outputOf[k] != None:
+                outputs[k] = _permute(outputs[k], self.outputOf[k])
+
+            if np != None and isinstance(reference, np.ndarray):
+                different = np.flatnonzero(outputs[k] != reference).tolist()
+            else:
+                different = [i for i in range(0, len(reference)) if outputs[k][i] != reference[i]]
+
+            if different:
+                self.mismatches[k] += len(different)
+
+                if self.firstMismatch[k] == None:
+                    i = different[0]
+                    self.firstMismatch[k] = (self.applied + i, int(vectors[i]), int(reference[i]), int(outputs[k][i]))
+
+    def replay(self, pieces, every):
+        ''' Applies a stream of vector lists or arrays to every member as it
+            arrives. Yields (vectors applied, energy of each member) every
+            vectors and at the end of the stream '''
+
+        for vectors, end in windows(pieces, every):
+            if len(vectors):
+                self.apply(vectors)
+
+            if end:
+                yield self.applied, self.energies()
+
+    def energies(self):
+        ''' Energy of each member for the vectors applied so far '''
+        return self._each(_energy)
+
+    def resetInputs(self):
+        ''' Resets the inputs information of every member '''
+
+        self._each(_reset)
+
+        self.applied = 0
+        self.mismatches = [0]*len(self)
+        self.firstMismatch = [None]*len(self)
+
+    def close(self):
+        ''' Stops the pool of the group '''
+
+        if self.pool == 'thread':
+            self.executors.shutdown()
+        elif self.pool == 'process':
+            for executor in self.executors:
+                executor.shutdown()
+
+        self.executors = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _initMember(filename):
+    ''' Loads the circuit of a member process '''
+    _member['circuit'] = readCircuitJSON(filename)
+
+def _onMember(task, *args):
+    ''' Runs a task on the circuit of a member process '''
+    return task(_member['circuit'], *args)
+
+def _ports(circuit):
+    return list(circuit.inputNames), list(circuit.outputNames)
+
+def _order(names, targets):
+    ''' Index in names of each of the target names, or None if they are equal '''
+
+    if names == targets:
+        return None
+
+    return [names.index(name) for name in targets]
+
+def _permute(values, order):
+    ''' Values (an array, or a list of ints) with bit i taken from bit order[i] '''
+
+    if np != None and isinstance(values, np.ndarray):
+        values = values.astype(np.uint64)
+        permuted = np.zeros(len(values), dtype = np.uint64)
+        for i in range(0, len(order)):
+            permuted |= ((values >> np.uint64(order[i])) & np.uint64(1)) << np.uint64(i)
+
+        return permuted
+
+    return [sum(((value >> order[i]) & 1) << i for i in range(0, len(order))) for value in values]
+
+def _applyArray(circuit, vectors, outputs):
+    return circuit.applyInputs(vectors, outputs = outputs)
+
+def _applyWords(circuit, vectors, packed, outputs):
+    return circuit.applyInputsParallel(vectors, WIDTH, outputs, packed)
+
+def _energy(circuit):
+    return circuit.calculateEnergy()
+
+def _reset(circuit):
+    circuit.resetInputs()
+
+if __name__ == "__main__":
+    pass
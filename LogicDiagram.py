@@ -1,9 +1,75 @@
+import hashlib
 import json
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from array import array
+from collections import deque
 from enum import Enum
-from BasicGates import NOTGate, ANDGate, ORGate, NANDGate, NORGate, MAJGate, BUFFERGate
+from LogicGate import xlog2x, entropySum
+from BasicGates import NOTGate, ANDGate, ORGate, NANDGate, NORGate, MAJGate, BUFFERGate, GENERICGate
+from Module import MODULE_BITS, Module, MODULEGate
+from CompiledCircuit import CompiledCircuit
+from EnergyProfile import EnergyProfile
+from ExactEnergy import exactEnergy
+from SignalProbability import estimateEnergy
+from MonteCarlo import sampleEnergy
+from Combinations import revolvingDoor
+from CircuitCache import LAZY, cachePath, readCache, writeCache
+
+# Gate types of the JSON format
+GATE_TYPES = ('buffer', 'not', 'and', 'or', 'nand', 'nor', 'majority', 'generic')
+
+# Backends of compile
+BACKENDS = ('table', 'pycodegen')
+
+# Gate classes by name, as stored on compiled caches
+_GATE_CLASSES = {cls.__name__ : cls for cls in (NOTGate, ANDGate, ORGate, NANDGate, NORGate, MAJGate, BUFFERGate, GENERICGate)}
     
-def readCircuitJSON(filename):
+def readCircuitJSON(filename, cache = True):
+    ''' Loads a circuit from a JSON file. If cache is set, a compiled binary
+        copy is kept beside the file and memory mapped by later loads, as long
+        as the JSON file does not change '''
+
+    source = None
+    with open(filename, 'rb') as f:
+        source = f.read()
+    
+    # File exist
+    assert source != None, "[ERROR] FILE DOES NOT EXIST"
+    
+    circuitid = filename.split('.json')[0]
+    
+    # Compiled cache of this same source
+    digest = hashlib.sha256(source).digest()
+    if cache:
+        image = readCache(cachePath(filename), digest)
+        if image != None:
+            return _circuitFromImage(circuitid, image)
+    
+    file = json.loads(source)
+    
+    circuit = circuitFromJSON(circuitid, file)
+    
+    # Compiles it and keeps it for the next loads (if the directory is writable).
+    # Module tables are not kept, so circuits with module instances are not
+    if cache and not any(isinstance(p, MODULEGate) for p in circuit.ports):
+        try:
+            _writeCircuitCache(circuit, cachePath(filename), digest)
+        except OSError:
+            pass
+    
+    return circuit
+    
+def circuitFromJSON(circuitid, file, modules = None):
+    ''' Creates a circuit from a dict in the JSON format of readCircuitJSON.
+        Gates may also be instances of modules, defined in its modules section
+        (or given by name): modules of up to MODULE_BITS inputs are collapsed
+        once into tables shared by their instances, wider ones are flattened
+        into their gates on each instance '''
 
     class WireInfo:
         ''' Contains informations for each wire
@@ -45,20 +111,15 @@ def readCircuitJSON(filename):
         def destiny(self, gateinfo):
             self._destiny.append(gateinfo)
 
-    file = None
-    with open(filename, 'r') as f:
-        file = json.load(f)
-    
-    # File exist
-    assert file != None, "[ERROR] FILE DOES NOT EXIST"
-    
     # Check keys
     assert 'inputs' in file, "[ERROR] NO INPUTS"
     assert 'outputs' in file, "[ERROR] NO OUTPUTS"
     assert 'gates' in file, "[ERROR] NO GATES"
-
-    circuitid = filename.split('.json')[0]
     
+    # Modules, and gates with the instances of wide modules flattened
+    modules = _loadModules(file.get('modules', {}), modules)
+    gates = _flattenGates(file['gates'], modules)
+
     # Load circuit object
     circuit = LogicDiagram(circuitid, len(file['inputs']), len(file['outputs']))
     
@@ -68,18 +129,22 @@ def readCircuitJSON(filename):
     circuit.createInputs(inputnames)
     circuit.createOutputs(outputnames)
     
+    # Sets for constant time lookups
+    inputnames = set(inputnames)
+    outputnames = set(outputnames)
+    
     # Inputs/Outputs connections
     inputcon = {inputname:WireInfo() for inputname in inputnames}
     outputcon = {outputname:WireInfo() for outputname in outputnames}
 
     # Loads gates information
     wires = {}
-    gatenames = []
-    for gatename, gateinfo in file['gates'].items():
+    gatenames = set()
+    for gatename, gateinfo in gates.items():
     
         # Check gate name
         assert gatename not in gatenames, "[ERROR] TWO OR MORE INSTANCES OF " + gatename
-        gatenames.append(gatename)
+        gatenames.add(gatename)
         
         # Check keys
         assert 'inputs' in gateinfo, "[ERROR] NO INPUTS FOR " + gatename
@@ -112,8 +177,10 @@ def readCircuitJSON(filename):
                 # Adds destiny
                 wires[input].destiny = (gatename, i)
                 
-        # Check outputs
+        # Check outputs (a single output may be given by its name)
         outputsinfo = gateinfo['outputs']
+        if isinstance(outputsinfo, str):
+            outputsinfo = [outputsinfo]
         for i in range(0, len(outputsinfo)):
         
             output = outputsinfo[i]
@@ -143,16 +210,23 @@ def readCircuitJSON(filename):
                 wires[output].origin = (gatename, i)
                 
         # After everythin is loaded, we create our gate
-        circuit.addGate(gatename, gateinfo['type'], len(gateinfo['inputs']), len(gateinfo['outputs']))
+        if gateinfo['type'] in modules:
+            circuit.addGate(gatename, 'module', len(inputsinfo), len(outputsinfo), module = modules[gateinfo['type']])
+        else:
+            circuit.addGate(gatename, gateinfo['type'], len(inputsinfo), len(outputsinfo))
+    
+    # All connections, wired at once
+    edges = []
     
     # Connect inputs
     for inputname, inputc in inputcon.items():
         for destiny in inputc.destiny:
-            circuit.connectInput(inputname, destiny[0], destiny[1])
+            edges.append((inputname, None, destiny[0], destiny[1]))
     
     # Connect outputs
     for outputname, outputc in outputcon.items():
-        circuit.connectOutput(outputname, outputc.origin[0], outputc.origin[1])
+        assert outputc.hasOrigin(), "[ERROR] OUTPUT NOT CONNECTED (" + outputname + ")"
+        edges.append((outputc.origin[0], outputc.origin[1], outputname, None))
     
     # Connect wires
     for wirename, wireinfo in wires.items():
@@ -164,7 +238,160 @@ def readCircuitJSON(filename):
         originbit = wireinfo.origin[1]
         
         for destiny in wireinfo.destiny:
-            circuit.connectGates(originname, originbit, destiny[0], destiny[1])
+            edges.append((originname, originbit, destiny[0], destiny[1]))
+    
+    circuit.connectMany(edges)
+    
+    return circuit
+    
+def _loadModules(definitions, modules = None):
+    ''' Modules of a modules section (plus the given ones) by name: a Module
+        for the ones of up to MODULE_BITS inputs and the definition itself for
+        wider ones, to be flattened. Modules may use each other, in any order '''
+    
+    modules = dict(modules or {})
+    loading = set()
+    
+    def load(name):
+        if name in modules:
+            return
+        
+        assert name not in loading, "[ERROR] RECURSIVE MODULE (" + name + ")"
+        assert name not in GATE_TYPES, "[ERROR] MODULE NAME IS A GATE TYPE (" + name + ")"
+        loading.add(name)
+        
+        # Modules used by this one come first
+        definition = definitions[name]
+        for gateinfo in definition.get('gates', {}).values():
+            if gateinfo.get('type') in definitions:
+                load(gateinfo['type'])
+        
+        if len(definition.get('inputs', [])) <= MODULE_BITS:
+            modules[name] = Module(name, circuitFromJSON(name, definition, modules))
+        else:
+            modules[name] = definition
+            
+        loading.discard(name)
+        
+    for name in definitions:
+        load(name)
+        
+    return modules
+    
+def _flattenGates(gates, modules):
+    ''' Gates of a gates section with the instances of wide modules replaced
+        by the module gates, named instance/gate. The module inputs and outputs
+        become the instance wires and its other wires are named instance/wire '''
+    
+    flat = {}
+    
+    for gatename, gateinfo in gates.items():
+        definition = modules.get(gateinfo.get('type'))
+        
+        if not isinstance(definition, dict):
+            flat[gatename] = gateinfo
+            continue
+            
+        inputs = gateinfo.get('inputs', [])
+        outputs = gateinfo.get('outputs', [])
+        if isinstance(outputs, str):
+            outputs = [outputs]
+            
+        assert len(inputs) == len(definition['inputs']) and len(outputs) == len(definition['outputs']), \
+        "[ERROR] WRONG NUMBER OF WIRES FOR MODULE INSTANCE " + gatename
+        
+        wires = dict(zip(definition['inputs'], inputs))
+        wires.update(zip(definition['outputs'], outputs))
+        
+        inner = {}
+        for name, info in definition['gates'].items():
+            innerOutputs = [info['outputs']] if isinstance(info['outputs'], str) else info['outputs']
+            inner[gatename + '/' + name] = dict(info,\
+            inputs = [wires.get(wire, gatename + '/' + wire) for wire in info['inputs']],\
+            outputs = [wires.get(wire, gatename + '/' + wire) for wire in innerOutputs])
+            
+        # Wide modules inside it are flattened too
+        for name, info in _flattenGates(inner, modules).items():
+            assert name not in flat and name not in gates, "[ERROR] TWO OR MORE INSTANCES OF " + name
+            flat[name] = info
+            
+    return flat
+    
+def _writeCircuitCache(circuit, path, digest):
+    ''' Writes the compiled cache of a circuit '''
+    
+    # Interned gate types and truth tables
+    types = []
+    typeIds = {}
+    tables = []
+    tableIds = {}
+    gates = []
+    
+    for p in circuit.ports:
+        typename = type(p).__name__
+        if typename not in typeIds:
+            typeIds[typename] = len(types)
+            types.append(typename)
+            
+        # Lazy gates are created again from their type
+        if p.isLazy():
+            gates.append((typeIds[typename], p.nbitsInput, p.nbitsOutput, LAZY))
+            continue
+            
+        key = (p.truthTable.itemsize, bytes(p.truthTable))
+        if key not in tableIds:
+            tableIds[key] = len(tables)
+            tables.append(p.truthTable)
+            
+        gates.append((typeIds[typename], p.nbitsInput, p.nbitsOutput, tableIds[key]))
+    
+    # Every connection
+    edges = [circuit.edges[i:i + 4] for i in range(0, len(circuit.edges), 4)]
+    
+    names = circuit.inputNames + circuit.outputNames + [p.name for p in circuit.ports] + types
+    
+    writeCache(path, digest, names, gates, tables, edges, circuit.compile().arrays()[0:4])
+    
+def _circuitFromImage(circuitid, image):
+    ''' Creates a circuit from a memory mapped compiled cache, without
+        validating it again or building any truth table '''
+    
+    gates = image.gates
+    tables = image.tables()
+    
+    # Inputs and outputs ports come first
+    ngates = len(gates)//4
+    nbitsInput = gates[1]
+    nbitsOutput = gates[5]
+    
+    names = image.names
+    gatenames = names[nbitsInput + nbitsOutput:nbitsInput + nbitsOutput + ngates]
+    types = [_GATE_CLASSES[name] for name in names[nbitsInput + nbitsOutput + ngates:]]
+    
+    # Lazy gates get their own (computed) table
+    ports = []
+    tableIndex = []
+    for i in range(0, 4*ngates, 4):
+        if gates[i+3] == LAZY:
+            ports.append(types[gates[i]](gatenames[i//4], gates[i+1]))
+            tableIndex.append(len(tables))
+            tables.append(ports[-1].truthTable)
+        else:
+            ports.append(types[gates[i]].fromTruthTable(gatenames[i//4], gates[i+1], gates[i+2], tables[gates[i+3]]))
+            tableIndex.append(gates[i+3])
+    
+    circuit = LogicDiagram(circuitid, nbitsInput, nbitsOutput, ports)
+    circuit.createInputs(names[0:nbitsInput])
+    circuit.createOutputs(names[nbitsInput:nbitsInput + nbitsOutput])
+    
+    # Connections, already validated when the cache was written. They stay
+    # on the file until the circuit is changed (see connectMany)
+    circuit.edges = image.edges
+        
+    # Levelized circuit
+    order, levels, faninStart, faninNet = image.compiled
+    circuit._compiled = CompiledCircuit.fromArrays(ports, order, levels, faninStart, faninNet,\
+    tables, [tableIndex[i] for i in order])
     
     return circuit
         
@@ -175,7 +402,7 @@ class LogicDiagram:
     diagramids = 0
 
     # Class constructor
-    def __init__(self, circuitname, nbitsInput, nbitsOutput):
+    def __init__(self, circuitname, nbitsInput, nbitsOutput, ports = None):
     
         # Number of bits in input and output
         self.nbitsInput = nbitsInput
@@ -186,24 +413,52 @@ class LogicDiagram:
         LogicDiagram.diagramids += 1
         self.circuitname = circuitname
         
-        # Creates inputs and outputs
-        self.ports = [BUFFERGate(self.circuitid, '___@*&Inputs@@@@', nbitsInput)]
-        self.ports.append(BUFFERGate(self.circuitid, '___@*&Outputs@@@@', nbitsOutput))
+        # Gate registry of this circuit, the id of a gate is its index.
+        # Creates inputs and outputs (ids 0 and 1), unless already given
+        if ports == None:
+            self.ports = [BUFFERGate('___@*&Inputs@@@@', nbitsInput)]
+            self.ports.append(BUFFERGate('___@*&Outputs@@@@', nbitsOutput))
+        else:
+            self.ports = ports
         
         # Reserves space for input/output names
         self.inputNames = ['' for _ in range(nbitsInput)]
         self.outputNames = ['' for _ in range(nbitsOutput)]
         
+        # Index of each input, output and gate name
+        self.inputIds = {}
+        self.outputIds = {}
+        self.gateIds = {p.name : i for i, p in enumerate(self.ports)}
+        
+        # Connections, (origin, originBit, destinyBit, destiny) each, packed
+        # as on the circuit cache
+        self.edges = array('I')
+        
+        # Bit mask of the already connected input bits of each gate
+        self._driven = [0 for _ in self.ports]
+        
+        # Levelized circuit, compiled on first use
+        self._compiled = None
+        self._profile = None
+        # Profile of the compiled circuit while profiling (True until compiled), None otherwise
+        self._profiler = None
+        self._backend = 'table'
+        
+        # Running sums of c*log2(c) per compiled gate, kept by addVector/removeVector
+        self._running = None
+        
     def createInputs(self, inputNames):
         ''' Gives a name for each input '''
         
         assert len(inputNames) == self.nbitsInput, "[ERROR] INVALID SIZE FOR INPUT NAMES"
         
         for i in range(0, self.nbitsInput):
-            assert inputNames[i] not in self.outputNames, "[ERROR] CAN NOT HAVE INPUTS WITH SAME NAME AS OUTPUTS"
+            assert inputNames[i] not in self.outputIds, "[ERROR] CAN NOT HAVE INPUTS WITH SAME NAME AS OUTPUTS"
     
         for i in range(0, self.nbitsInput):
             self.inputNames[i] = inputNames[i]
+            
+        self.inputIds = {self.inputNames[i] : i for i in range(0, self.nbitsInput)}
         
     def createOutputs(self, outputNames):
         ''' Gives a name for each output '''
@@ -211,130 +466,256 @@ class LogicDiagram:
         assert len(outputNames) == self.nbitsOutput, "[ERROR] INVALID SIZE FOR OUTPUT NAMES"
         
         for i in range(0, self.nbitsOutput):
-            assert outputNames[i] not in self.inputNames, "[ERROR] CAN NOT HAVE INPUTS WITH SAME NAME AS OUTPUTS"
+            assert outputNames[i] not in self.inputIds, "[ERROR] CAN NOT HAVE INPUTS WITH SAME NAME AS OUTPUTS"
             
         for i in range(0, self.nbitsOutput):
             self.outputNames[i] = outputNames[i]
+            
+        self.outputIds = {self.outputNames[i] : i for i in range(0, self.nbitsOutput)}
         
     def addGate(self, gateName, gate, nbitsInput, nbitsOutput, **kwargs):
         ''' Adds a gate to diagram '''
         
+        assert gateName not in self.gateIds, "[ERROR] TWO OR MORE INSTANCES OF " + gateName
+        
+        self._invalidate()
+        
         # Checks gate type and add it
         if gate == 'buffer':
-            self.ports.append(BUFFERGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(BUFFERGate(gateName, nbitsInput))
         elif gate == 'not':
-            self.ports.append(NOTGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(NOTGate(gateName, nbitsInput))
         elif gate == 'and':
-            self.ports.append(ANDGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(ANDGate(gateName, nbitsInput))
         elif gate == 'or':
-            self.ports.append(ORGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(ORGate(gateName, nbitsInput))
         elif gate == 'nand':
-            self.ports.append(NANDGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(NANDGate(gateName, nbitsInput))
         elif gate == 'nor':
-            self.ports.append(NORGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(NORGate(gateName, nbitsInput))
         elif gate == 'majority':
-            self.ports.append(MAJGate(self.circuitid, gateName, nbitsInput))
+            self.ports.append(MAJGate(gateName, nbitsInput))
         elif gate == 'generic':
             inputs = kwargs.get('inputs')
             outputs = kwargs.get('outputs')
             
-            assert inputs != None, "[ERROR] NO GIVEN INPUTS TO GENERIC (" + gatename + ")"
-            assert outputs != None, "[ERROR] NO GIVEN OUTPUTS TO GENERIC (" + gatename + ")"
+            assert inputs != None, "[ERROR] NO GIVEN INPUTS TO GENERIC (" + gateName + ")"
+            assert outputs != None, "[ERROR] NO GIVEN OUTPUTS TO GENERIC (" + gateName + ")"
+            
+            self.ports.append(GENERICGate(gateName, nbitsInput, nbitsOutput, inputs, outputs))
+            
+        elif gate == 'module':
+            module = kwargs.get('module')
+            
+            assert module != None, "[ERROR] NO GIVEN MODULE (" + gateName + ")"
+            assert nbitsInput == module.nbitsInput and nbitsOutput == module.nbitsOutput, \
+            "[ERROR] WRONG NUMBER OF WIRES FOR MODULE INSTANCE " + gateName
             
-            self.ports.append(GENERICGate(self.circuitid, gateName, nbitsInput, nbitsOutput, logic_inputs, logic_outputs))
+            self.ports.append(MODULEGate(gateName, module))
             
         else:
             assert False, "[ERROR] INVALID GATE TYPE"
+            
+        # Registers the new gate id
+        self.gateIds[gateName] = len(self.ports) - 1
+        self._driven.append(0)
         
     def connectInput(self, inputName, gateName, gateInputBit):
         ''' Connect an input to a gate '''
         
-        found = False
-    
-        # Searchs inputName
-        for i in range(0, self.nbitsInput):
-            if inputName == self.inputNames[i]:
-                found = True
-                break
-        # Input not found
-        assert found, "[ERROR] INPUT NAME NOT FOUND"
+        self.connectMany([(inputName, None, gateName, gateInputBit)])
         
-        found = False
-    
-        for p in self.ports:
-            if p.name == gateName:
-                found = True
-                break
+    def connectOutput(self, outputName, gateName, gateOutputBit):
+        ''' Connect a gate to output '''
         
-        # Gate not found
-        assert found, "[ERROR] GATE NAME " + gateName + " NOT FOUND"
-        # Invalid gateInputBit
-        assert gateInputBit >= 0 and gateInputBit < p.getInputNum(),\
-        "[ERROR] BIT " + str(gateInputBit) + " ON " + gatename + " WAS NOTE FOUND"
+        self.connectMany([(gateName, gateOutputBit, outputName, None)])
         
-        self.ports[0].connectOutput(self.circuitid, i, gateInputBit, gateName)
+    def connectGates(self, gate1_Name, gate1_Output, gate2_Name, gate2_Input):
+        ''' Connects a gate to another '''
         
-    def connectOutput(self, outputName, gateName, gateOutputBit):
-        ''' Connect a gate to output '''
+        self.connectMany([(gate1_Name, gate1_Output, gate2_Name, gate2_Input)])
         
-        found = False
-    
-        # Searchs OutputName
-        for i in range(0, self.nbitsOutput):
-            if outputName == self.outputNames[i]:
-                found = True
-                break
-                
-        # Input not found
-        assert found, "[ERROR] OUTPUT NAME " + outputName + " NOT FOUND"
-    
-        found = False
+    def connectMany(self, edges):
+        ''' Validates and connects a list of edges
+            (originName, originBit, destinyName, destinyBit) in one pass.
+            An origin bit of None means the origin is a circuit input and a
+            destiny bit of None means the destiny is a circuit output '''
+        
+        self._invalidate()
+        
+        # Connections of a circuit cache are copied (with the input bits
+        # they drive) on the first change
+        if not isinstance(self.edges, array):
+            self.edges = array('I', self.edges)
+            self._driven = [0 for _ in self.ports]
+            for i in range(0, len(self.edges), 4):
+                self._driven[self.edges[i+3]] |= 1 << self.edges[i+2]
+        
+        wiring = []
+        driven = {}
+        
+        for originName, originBit, destinyName, destinyBit in edges:
+            
+            # Origin gate and output bit
+            if originBit == None:
+                assert originName in self.inputIds, "[ERROR] INPUT NAME " + str(originName) + " NOT FOUND"
+                origin, originBit = 0, self.inputIds[originName]
+            else:
+                assert originName in self.gateIds, "[ERROR] GATE NAME " + str(originName) + " NOT FOUND"
+                origin = self.gateIds[originName]
+                assert originBit >= 0 and originBit < self.ports[origin].nbitsOutput, \
+                "[ERROR] OUTPUT BIT " + str(originBit) +  " ON " + originName + " WAS NOT FOUND"
+            
+            # Destiny gate and input bit
+            if destinyBit == None:
+                assert destinyName in self.outputIds, "[ERROR] OUTPUT NAME " + str(destinyName) + " NOT FOUND"
+                destiny, destinyBit = 1, self.outputIds[destinyName]
+            else:
+                assert destinyName in self.gateIds, "[ERROR] GATE NAME " + str(destinyName) + " NOT FOUND"
+                destiny = self.gateIds[destinyName]
+                assert destinyBit >= 0 and destinyBit < self.ports[destiny].nbitsInput, \
+                "[ERROR] INPUT BIT " + str(destinyBit) +  " ON " + destinyName + " WAS NOT FOUND"
+            
+            # An input bit can only have one origin
+            mask = 1 << destinyBit
+            assert not ((self._driven[destiny] | driven.get(destiny, 0)) & mask), \
+            "[ERROR] MULTIPLE ORIGINS (" + str(destinyName) + ", " + str(destinyBit) + ")"
+            driven[destiny] = driven.get(destiny, 0) | mask
+            
+            wiring.append((origin, originBit, destinyBit, destiny))
+        
+        # Everything is valid, connects it
+        for connection in wiring:
+            self.edges.extend(connection)
+            
+        for destiny, mask in driven.items():
+            self._driven[destiny] |= mask
+        
+    def close(self):
+        ''' Frees the gates of this circuit and everything computed from them '''
+        
+        self._compiled = None
+        self._profile = None
+        self._running = None
+        if self._profiler != None:
+            self._profiler = True
+        self.ports = []
+        self.gateIds = {}
+        self.edges = array('I')
+        self._driven = []
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
     
-        for p in self.ports:
-            if p.name == gateName:
-                found = True
-                break
+    def compile(self, backend = None):
+        ''' Levelizes the diagram into a CompiledCircuit (cached until the diagram changes).
+            backend sets how single inputs are evaluated from then on: 'table'
+            (default) runs the per gate tables, 'pycodegen' straight-line Python
+            generated for the netlist (cached by netlist hash, see CodeGen) '''
+        
+        if backend != None and backend != self._backend:
+            assert backend in BACKENDS, "[ERROR] INVALID BACKEND (" + str(backend) + ")"
+            self._invalidate()
+            self._backend = backend
+        
+        if self._compiled == None:
+            self._compiled = CompiledCircuit(self.ports, self.edges)
+            if self._backend == 'pycodegen':
+                self._compiled.enableCodegen()
+            if self._profiler != None:
+                self._profiler = self._compiled.enableProfile()
+        
+        return self._compiled
+        
+    def _invalidate(self):
+        ''' Drops the compiled circuit, keeping its pending occurrences '''
+        
+        if self._compiled != None:
+            self._compiled.flush()
+            self._compiled = None
+            self._profile = None
+            self._running = None
+            if self._profiler != None:
+                self._profiler = True
+            
+    def energyProfile(self):
+        ''' Per gate local input of every primary input (cached until the diagram changes).
+            Its energyOf(counts) gives the energy of any multiset of inputs without simulating '''
         
-        # Gate not found
-        assert found, "[ERROR] GATE NAME " + gateName + " NOT FOUND"
-        # Invalid gateInputBit
-        assert not (gateOutputBit < 0 or gateOutputBit >= p.getOutputNum()), \
-        "[ERROR] OUTPUT BIT " + str(gateOutputBit) +  " ON " + gateName + " WAS NOT FOUND" 
+        if self._profile == None:
+            self._profile = EnergyProfile(self.compile())
         
-        p.connectOutput(self.circuitid, i, gateOutputBit, '___@*&Outputs@@@@')
+        return self._profile
+    
+    def exactEnergy(self, ordering = 'dfs'):
+        ''' Energy over every input once, as calculateEnergy after applyAllInputs,
+            counted on BDDs of the gate fanins instead of applying 2^n inputs.
+            Does not change the inputs information '''
         
-    def connectGates(self, gate1_Name, gate1_Output, gate2_Name, gate2_Input):
-        ''' Connects a gate to another '''
+        return exactEnergy(self.compile(), ordering)
+    
+    def estimateEnergy(self, inputProbs = None, exactBits = 0):
+        ''' Estimates the energy for independent inputs in one pass, propagating
+            the 1-probability of every net. inputProbs gives the probability of
+            each input, as a list (in input order), a dict by input name or a
+            single number (0.5 for all by default). Reconvergent gates depending
+            on up to exactBits inputs are computed exactly. Returns (energy, unsafe),
+            unsafe being the names of the reconvergent gates left estimated '''
+        
+        if inputProbs == None:
+            inputProbs = 0.5
+        if isinstance(inputProbs, dict):
+            inputProbs = [inputProbs[name] for name in self.inputNames]
+        elif isinstance(inputProbs, (int, float)):
+            inputProbs = [inputProbs]*self.nbitsInput
+        
+        compiled = self.compile()
+        energy, unsafe = estimateEnergy(compiled, inputProbs, exactBits)
+        
+        return energy, [compiled.gates[k].name for k in unsafe]
+    
+    def sampleEnergy(self, nMax, relTol = 0.01, seed = None, workers = 1):
+        ''' Estimates the energy over uniformly random inputs, drawing batches
+            until the 95% confidence interval is within relTol of the estimate
+            or nMax inputs were drawn, optionally on workers processes.
+            Returns (energy, half width, inputs drawn). Does not change the
+            inputs information '''
+        
+        return sampleEnergy(self.compile(), nMax, relTol, seed, workers)
+    
+    def profile(self, enable = True):
+        ''' Turns profiling on or off. While on, every evaluation counts, per
+            gate, its evaluations, time and output net events, and the time of
+            each phase (see stats). Counters restart when the diagram changes.
+            Off, evaluations run without any profiling code '''
+        
+        if enable == (self._profiler != None):
+            return
+        
+        # Recompiles with or without the profiled evaluations
+        self._invalidate()
+        self._profiler = True if enable else None
+            
+    def _timed(self, method, phase, *args):
+        ''' Calls method, timed on the profile of the compiled circuit '''
         
-        found = False
+        self.compile()
+        
+        return self._profiler.timed(method, phase)(*args)
     
-        # Searchs gate 1
-        for i in range(0, len(self.ports)):
-            if gate1_Name == self.ports[i].name:
-                found = True
-                break
-                
-        # Gate 1 not found
-        assert found, "[ERROR] GATE NAME " + gate1_Name + " NOT FOUND"
+    def stats(self):
+        ''' Profiling counters (see profile) as a dict: seconds per phase and,
+            per gate in level order, its name, type, evaluations, seconds and
+            events of each output net '''
         
-        found = False
-
-        # Searchs gate 2
-        for j in range(0, len(self.ports)):
-            if gate2_Name == self.ports[j].name:
-                found = True
-                break
-                
-        # Gate 2 not found
-        assert found, "[ERROR] GATE NAME " + gate2_Name + " NOT FOUND"
+        assert self._profiler != None, "[ERROR] PROFILING IS NOT ENABLED"
         
-        # Invalid gateOutputBit
-        assert not (gate1_Output < 0 or gate1_Output >= self.ports[j].getOutputNum()), \
-        "[ERROR] OUTPUT BIT " + str(gate1_Output) +  " ON " + gate1_Name + " WAS NOT FOUND" 
-        assert not (gate2_Input < 0 or gate2_Input >= self.ports[j].getInputNum()), \
-        "[ERROR] INPUT BIT " + str(gate2_Output) +  " ON " + gate2_Name + " WAS NOT FOUND" 
+        self.compile()
         
-        self.ports[i].connectOutput(self.circuitid, gate1_Output, gate2_Input, gate2_Name)
+        return self._profiler.stats()
     
     def showDiagram(self):
         pass
@@ -354,33 +735,275 @@ class LogicDiagram:
         inp = 0
         
         for i in range(0, self.nbitsInput):
-            inp += input[i] >> i
+            inp += input[i] << i
 
         # Apply input
-        self.ports[0].applyInput(self.circuitid, inp)
-
-        # Updates everything
-        for i in range(0, len(self.ports)):
-            self.ports[i].update(self.circuitid)
+        self.applyInput(inp)
         
     def applyInput(self, input):
         ''' Applies an input '''
         
-        # Apply input
-        self.ports[0].applyInput(self.circuitid, input)
+        assert input >= 0 and input < self.ports[0].getInputNum(), "[ERROR] INVALID INPUT (" + str(input) + ")"
+        
+        # Evaluates every gate once, in level order
+        self._running = None
+        output = self.compile().evaluate(input)
+        
+        # Keeps the signal at the outputs
+        if output != None:
+            self.ports[1].outputSignal = output
+        
+    def applyInputsParallel(self, inputs, width = 4096, outputs = False, packed = None):
+        ''' Applies a list of inputs, evaluating up to width inputs at once
+            (one per bit of each word). Returns the list of circuit outputs
+            of the inputs if outputs is set. packed, if given, holds the words
+            of every width inputs (see CompiledCircuit.packInputs), already
+            checked and packed by the caller '''
+        
+        compiled = self.compile()
+        self._running = None
+        results = []
+        
+        for start in range(0, len(inputs), width):
+            count = min(width, len(inputs) - start)
+            
+            if packed != None:
+                words = packed[start//width]
+            else:
+                assert all(0 <= i < self.ports[0].getInputNum() for i in inputs[start:start+width]), \
+                "[ERROR] INVALID INPUT"
+                words = compiled.packInputs(inputs[start:start+count])
+            
+            words = compiled.evaluateWords(words, count)
+            
+            if outputs and words != None:
+                results.extend(sum(((words[i] >> j) & 1) << i for i in range(0, len(words))) for j in range(0, count))
+            
+        # Keeps the signal at the outputs for the last input
+        if inputs and words != None:
+            self.ports[1].outputSignal = sum(((words[i] >> (count-1)) & 1) << i for i in range(0, len(words)))
+            
+        if outputs:
+            return results if compiled.outputGate != None else None
+            
+    def applyAllInputs(self, width = 1 << 16):
+        ''' Applies every possible input once, bit-parallel '''
+        
+        compiled = self.compile()
+        self._running = None
+        total = self.ports[0].getInputNum()
+        
+        # Power of two number of inputs per pass
+        count = 1
+        while count < width and count < total:
+            count <<= 1
+            
+        for start in range(0, total, count):
+            outputs = compiled.evaluateWords(compiled.exhaustiveWords(start, count), count)
+            
+        # Keeps the signal at the outputs for the last input
+        if outputs != None:
+            self.ports[1].outputSignal = sum(((outputs[i] >> (count-1)) & 1) << i for i in range(0, len(outputs)))
+        
+    def applyInputs(self, vectors, batch = 1 << 16, outputs = False):
+        ''' Applies an array (or any buffer) of inputs with NumPy, batch inputs
+            at a time. Returns the array of circuit outputs of the inputs if
+            outputs is set '''
+        
+        assert np != None, "[ERROR] NUMPY IS REQUIRED FOR applyInputs"
         
-        # Updates everything
-        for i in range(0, len(self.ports)):
-            self.ports[i].update()
+        vectors = np.asarray(vectors).ravel()
+        compiled = self.compile()
+        
+        if len(vectors) == 0:
+            return np.zeros(0, dtype = np.uint64) if outputs and compiled.outputGate != None else None
+        
+        assert vectors.min() >= 0 and vectors.max() < self.ports[0].getInputNum(), "[ERROR] INVALID INPUT"
+        
+        self._running = None
+        results = []
+        
+        for start in range(0, len(vectors), batch):
+            result = compiled.evaluateArray(vectors[start:start+batch])
+            if outputs and result is not None:
+                results.append(result)
+            
+        # Keeps the signal at the outputs for the last input
+        if result is not None:
+            self.ports[1].outputSignal = int(result[-1])
+            
+        if outputs and result is not None:
+            return results[0] if len(results) == 1 else np.concatenate(results)
+        
+    def addVector(self, input, locals = None):
+        ''' Applies an input, keeping running entropy sums so that
+            calculateEnergy only costs one step per gate. locals, if given,
+            are the local inputs of the gates for it (as from localsOf), so
+            the circuit is not evaluated again '''
+        
+        self._updateVector(input, 1, locals)
+        
+    def removeVector(self, input, locals = None):
+        ''' Removes one occurrence of a previously applied input (see addVector) '''
+        
+        self._updateVector(input, -1, locals)
+        
+    def _updateVector(self, input, step, locals = None):
+        ''' _stepVector, timed while profiling '''
+        
+        if self._profiler != None:
+            return self._timed(self._stepVector, 'accounting', input, step, locals)
+        
+        return self._stepVector(input, step, locals)
+        
+    def _stepVector(self, input, step, locals = None):
+        ''' Adds step to the occurrences of an input on every gate. Returns the
+            local input of each gate, which may be given back to skip evaluating
+            the same input again '''
+        
+        assert input >= 0 and input < self.ports[0].getInputNum(), "[ERROR] INVALID INPUT (" + str(input) + ")"
+        
+        compiled = self.compile()
+        
+        # Starts the running sums from the current occurrences
+        if self._running == None:
+            compiled.flush()
+            self._running = ([], [], [])
+            for gate in compiled.gates:
+            
+                # Module instances keep the occurrences of every gate inside them
+                if isinstance(gate, MODULEGate):
+                    leaves = gate.module.leafOccurrences(gate.occurrences)
+                    self._running[0].append(sum(entropySum(inputs) for inputs, _ in leaves))
+                    self._running[1].append(sum(entropySum(outputs) for _, outputs in leaves))
+                    self._running[2].append(leaves)
+                else:
+                    self._running[0].append(entropySum(gate.occurrences))
+                    self._running[1].append(entropySum(gate.outputOccurr))
+                    self._running[2].append(None)
+                
+        assert step > 0 or compiled.gates[0].occurrences[input] > 0, \
+        "[ERROR] INPUT " + str(input) + " WAS NOT APPLIED"
+        
+        inputSums, outputSums, leaves = self._running
+        if locals == None:
+            locals = compiled.localsOf(input)
+        
+        for k in range(0, len(locals)):
+            gate = compiled.gates[k]
+            local = locals[k]
+            
+            # Input occurrence
+            ocurrences = gate.occurrences[local]
+            gate.occurrences[local] = ocurrences + step
+            gate.inputsOcurrNum += step
+            
+            # Output occurrence
+            output = gate.truthTable[local]
+            outputOcurrences = gate.outputOccurr[output]
+            gate.outputOccurr[output] = outputOcurrences + step
+            
+            # Module instances sum the gates inside them instead
+            if leaves[k] != None:
+                inputChange, outputChange = gate.module.step(leaves[k], local, step)
+                inputSums[k] += inputChange
+                outputSums[k] += outputChange
+            else:
+                inputSums[k] += xlog2x(ocurrences + step) - xlog2x(ocurrences)
+                outputSums[k] += xlog2x(outputOcurrences + step) - xlog2x(outputOcurrences)
+            
+        # Keeps the signal at the outputs
+        if compiled.outputGate != None:
+            self.ports[1].outputSignal = locals[compiled.outputGate]
+            
+        return locals
+        
+    def sweepCombinations(self, inputs, size):
+        ''' Yields (combination, energy) for every combination of size inputs of
+            the given list, in revolving-door order, so each step only removes
+            one input and adds another. Starts by resetting all inputs information '''
+        
+        self.resetInputs()
+        previous = None
+        
+        for combination in revolvingDoor(len(inputs), size):
+            
+            if previous == None:
+                for i in combination:
+                    self.addVector(inputs[i])
+            else:
+                for i in previous.difference(combination):
+                    self.removeVector(inputs[i])
+                for i in set(combination).difference(previous):
+                    self.addVector(inputs[i])
+                    
+            previous = set(combination)
+            
+            yield tuple(inputs[i] for i in combination), self.calculateEnergy()
+            
+    def windowEnergy(self, vectors, window, stride = 1):
+        ''' Yields (vectors applied, energy of the last window vectors) for an
+            iterable of inputs, every stride vectors once the window is full.
+            Each vector is added and the expired one removed, so a sample costs
+            O(stride) steps instead of O(window). The local inputs of the vectors
+            in the window are kept, so removing one does not evaluate it again.
+            Starts by resetting all inputs information '''
+        
+        assert window > 0 and stride > 0, "[ERROR] INVALID WINDOW (" + str(window) + ", " + str(stride) + ")"
+        
+        self.resetInputs()
+        recent = deque()
+        applied = 0
+        
+        for input in vectors:
+        
+            # Removed first, so the outputs keep the signal of the new vector
+            if len(recent) == window:
+                expired, locals = recent.popleft()
+                self._updateVector(expired, -1, locals)
+                
+            recent.append((input, self._updateVector(input, 1)))
+                
+            applied += 1
+            if applied >= window and (applied - window) % stride == 0:
+                yield applied, self.calculateEnergy()
         
     def resetInputs(self):
         ''' Resets all inputs information '''
     
+        self._running = None
+        
+        if self._compiled != None:
+            self._compiled.reset()
+    
         for p in self.ports:
             p.resetInputs()
         
     def calculateEnergy(self):
         ''' Calculates total energy on circuit '''
+        
+        if self._profiler != None:
+            return self._timed(self._calculateEnergy, 'entropy')
+        
+        return self._calculateEnergy()
+        
+    def _calculateEnergy(self):
+        ''' calculateEnergy, without profiling '''
+    
+        # Running sums are up to date
+        if self._running != None:
+            energy = 0.0
+            
+            for k in range(0, len(self._compiled.gates)):
+                ocurrences = self._compiled.gates[k].inputsOcurrNum
+                if ocurrences != 0:
+                    energy += (self._running[1][k] - self._running[0][k])/ocurrences
+                    
+            return energy
+    
+        # Adds pending occurrences to the gates
+        if self._compiled != None:
+            self._compiled.flush()
     
         energy = 0.0
         
@@ -1,30 +1,136 @@
 from abc import ABC, abstractmethod
+from array import array
+from hashlib import sha256
 from math import log2
+from weakref import WeakValueDictionary
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# Gates with more input (or output) bits than this only keep the
+# occurrences of the entries that were observed
+SPARSE_BITS = 16
+
+# Gates with more input bits than this evaluate their function on each
+# lookup instead of storing a truth table (if they have one)
+TABLE_BITS = 16
+
+# Read only truth tables shared by every gate of the process, by their
+# typecode and content hash. Tables that only depend on the gate type and
+# widths are also keyed by (class, nbitsInput, nbitsOutput). Entries only
+# live while some gate (or compiled circuit) still uses the table
+_tables = WeakValueDictionary()
+
+def internTable(table, key = None):
+	''' Shared read only view of a truth table (an array or any buffer), the
+	already interned one if there is a table with the same content. It is
+	also registered by key, if given '''
+	
+	view = memoryview(table)
+	content = (view.format, sha256(view).digest())
+	
+	interned = _tables.get(content)
+	if interned is None:
+		interned = view.toreadonly()
+		_tables[content] = interned
+	if key != None:
+		_tables.setdefault(key, interned)
+		
+	return interned
+	
+def internedTables():
+	''' Number of interned truth tables and their total bytes '''
+	
+	tables = {id(table) : table for table in list(_tables.values())}
+	
+	return len(tables), sum(table.nbytes for table in tables.values())
+	
+def xlog2x(x):
+	''' x*log2(x), being 0 for x = 0 '''
+	
+	return x*log2(x) if x > 0 else 0.0
+	
+class SparseCounts(dict):
+	''' Occurrences of the observed entries only, the others read as 0 '''
+	
+	__slots__ = ()
+	
+	def __missing__(self, key):
+		return 0
+	
+class FunctionTable:
+	''' Read only truth table of a wide gate, computing each output from the
+	gate function instead of storing 2^nbits entries '''
+	
+	__slots__ = ('function', 'length')
+	
+	def __init__(self, function, nbits):
+		self.function = function
+		self.length = 1 << nbits
+		
+	def __len__(self):
+		return self.length
+		
+	def __getitem__(self, index):
+		if index < 0:
+			index += self.length
+		if index < 0 or index >= self.length:
+			raise IndexError(index)
+		return self.function(index)
+		
+	def __iter__(self):
+		for i in range(0, self.length):
+			yield self.function(i)
+	
+def newCounts(nbits):
+	''' Occurrences of each of the 2^nbits entries, all 0. Dense array
+	for narrow entries, sparse for wide ones '''
+	
+	if nbits > SPARSE_BITS:
+		return SparseCounts()
+		
+	return array('Q', bytes(8 << nbits))
+	
+def entropySum(counts):
+	''' Sum of c*log2(c) for all non zero occurrences (or probabilities),
+	dense (any sequence or array) or sparse (a dict) '''
+	
+	if isinstance(counts, dict):
+		return sum(xlog2x(c) for c in counts.values())
+	
+	if np == None:
+		return sum(xlog2x(c) for c in counts)
+		
+	counts = np.asarray(counts)
+	counts = counts[counts != 0].astype(np.float64)
+	
+	return float(np.dot(counts, np.log2(counts)))
 
 class LogicGate(ABC):
 	''' Abstract class of a generic gate '''
 
-	# Posteriormente quero adicionar isso para performance...
+	# Gates keep no __dict__, subclasses must declare __slots__ too
+	
+	# Output of an input computed by the gate logic, on ints or NumPy
+	# arrays of ints. Gates without one always keep a truth table
+	_function = None
+	
 	__slots__ = ('name', 'nbitsInput', 'nbitsOutput',\
-	'inputsOcurrNum', 'updatedBits', 'inputSignal', 'outputSignal'\
-	'input', 'outputOccurr', 'outputBits')
+	'inputsOcurrNum', 'inputSignal', 'outputSignal',\
+	'truthTable', 'occurrences', 'outputOccurr')
 
-	# Stores existing gates on circuits
-	gateList = {}
-	
 	# Class constructor
-	def __init__(self, circuitid, name, nbitsInput, nbitsOutput = 1):
+	def __init__(self, name, nbitsInput, nbitsOutput = 1, truthTable = None):
 	
 		# Abstract Class Constructor
 		super().__init__()
-		
-		# If circuitid is not in our dict, adds it
-		if circuitid not in LogicGate.gateList:
-			LogicGate.gateList[circuitid] = {}
 	
-		# New gate
+		# New gate, the name is only used for I/O. Gates are registered
+		# by their integer id on their LogicDiagram, which also keeps their
+		# connections
 		self.name = name
-		LogicGate.gateList[circuitid][name] = self
 		
 		# Number of bits in gate input and output
 		self.nbitsInput = nbitsInput
@@ -33,192 +139,276 @@ class LogicGate(ABC):
 		# Total of ocurrences of inputs and outputs
 		self.inputsOcurrNum = 0
 		
-		# None updated bits
-		self.updatedBits = 0
-		
 		# Current signal at input and output
 		self.inputSignal = 0
 		self.outputSignal = 0
 		
-		# Creates a list with information of all possible gate entries.
-		self.input = [self.Input() for _ in range(self.getInputNum())]
-		
-		# Creates a list with information of all output occurrences
-		self.outputOccurr = [0]*(1<<self.nbitsOutput)
+		# Output of each possible gate entry, in the smallest array type that fits
+		# (or an already built table, any indexable buffer). Wide gates with a
+		# function compute each entry instead and gates of a type with an
+		# interned table take it (see _internOutputs)
+		if truthTable is None and self._function != None and self.nbitsInput > TABLE_BITS:
+			self.truthTable = FunctionTable(self._function, self.nbitsInput)
+		elif truthTable is None:
+			self.truthTable = _tables.get(self._typeKey())
+			if self.truthTable is None:
+				self.truthTable = array(_tableTypecode(self.nbitsOutput), [0])*self.getInputNum()
+		else:
+			self.truthTable = truthTable
+		
+		# Number of occurrences of each possible gate entry and of each output
+		self.occurrences = newCounts(self.nbitsInput)
+		self.outputOccurr = newCounts(self.nbitsOutput)
+		
+	@classmethod
+	def fromTruthTable(cls, name, nbitsInput, nbitsOutput, truthTable):
+		''' Creates a gate of this class from an already built truth table,
+		without building it again '''
+		
+		gate = cls.__new__(cls)
+		LogicGate.__init__(gate, name, nbitsInput, nbitsOutput, truthTable)
+		
+		return gate
+		
+	def __getstate__(self):
+		''' Slots to pickle, copying a shared or memory mapped truth table to an array '''
+		
+		state = {slot : getattr(self, slot) for slot in LogicGate.__slots__}
+		if isinstance(self.truthTable, memoryview):
+			state['truthTable'] = array(self.truthTable.format, self.truthTable)
+			
+		return state
 		
-		# Creates a list of lists with information of all output signals
-		self.outputBits = [[] for _ in range(self.nbitsOutput)]
+	def __setstate__(self, state):
+		for slot, value in state.items():
+			setattr(self, slot, value)
+			
+		# Unpickled gates share their tables again
+		if isinstance(self.truthTable, array):
+			self.truthTable = internTable(self.truthTable)
 		
 	class Input:
-		''' Structure that defines information for each input combination
-		For example, entry 000 has output 1 and this input has occurred 1 time.
-		Input 001 has output 0 and this input has occurred 2 times and etc... '''
+		''' View of the information of one input combination, stored in the
+		gate arrays. For example, entry 000 has output 1 and this input has
+		occurred 1 time. Input 001 has output 0 and this input has occurred 2 times and etc... '''
+		
+		__slots__ = ('gate', 'index')
 	
-		# The number of occurrences of the entry is initially equal to 0
-		def __init__(self):
-			self.ocurrences = 0
+		def __init__(self, gate, index):
+			self.gate = gate
+			self.index = index
+			
+		@property
+		def output(self):
+			return self.gate.truthTable[self.index]
+			
+		@property
+		def ocurrences(self):
+			return self.gate.occurrences[self.index]
 		
-		# Defines the output of the given input
+		@ocurrences.setter
+		def ocurrences(self, ocurrences):
+			self.gate.occurrences[self.index] = ocurrences
+		
+		# Defines the output of the given input (not for interned tables, read only)
 		def setOutput(self, output):
-			self.output = output
+			self.gate.truthTable[self.index] = output
 			
 		# Get output
 		def getOutput(self):
-			return self.output
+			return self.gate.truthTable[self.index]
 		
 		# Defines the number of occurrences
 		def setOcurrence(self, ocurrences):
-			self.ocurrences = ocurrences
+			self.gate.occurrences[self.index] = ocurrences
 		
 		# Increase number of occurrences
 		def incrementOcurrence(self):
-			self.ocurrences += 1
+			self.gate.occurrences[self.index] += 1
 		
 		# Reset the number of occurrences
 		def resetOcurrence(self):
-			self.ocurrences = 0
+			self.gate.occurrences[self.index] = 0
 		
 		# Regates the number of occurrences
 		def getOcurrence(self):
-			return self.ocurrences
-	
-	class OutputBit:
-		''' Class indicating information of each gate output bit '''
-		
-		# Indicates which gate the output bit is connected and which input bit
-		def __init__(self, gatename, inputbit):
-			self.gatename = gatename
-			self.inputbit = inputbit
+			return self.gate.occurrences[self.index]
+			
+	class Inputs:
+		''' Sequence of Input views of all possible gate entries '''
 		
-		def getInputBit(self):
-			return self.inputbit
+		__slots__ = ('gate',)
 		
-		def getGateName(self):
-			return self.gatename
-    
+		def __init__(self, gate):
+			self.gate = gate
+			
+		def __len__(self):
+			return self.gate.getInputNum()
+			
+		def __getitem__(self, index):
+			if index < 0:
+				index += len(self)
+			if index < 0 or index >= len(self):
+				raise IndexError(index)
+			return LogicGate.Input(self.gate, index)
+			
+		def __iter__(self):
+			for i in range(0, len(self)):
+				yield LogicGate.Input(self.gate, i)
+				
+	@property
+	def input(self):
+		''' Information of all possible gate entries, as views of the gate arrays '''
+		return self.Inputs(self)
+	
 	def addInputOcurrence(self):
 	
-		# Get data from input
-		inaux = self.input[self.inputSignal]
-			
 		# Increments ocurrence of input 
-		inaux.incrementOcurrence()
+		self.occurrences[self.inputSignal] += 1
 		
 		# Increments total ocurrence of inputs
 		self.inputsOcurrNum += 1
 		
-		self.outputOccurr[inaux.getOutput()] += 1
+		self.outputOccurr[self.truthTable[self.inputSignal]] += 1
 			
 	def showTruthTable(self):
 		''' Checks all possible input elements and prints outputs as a Truth Table '''
 	
-		for i in range(0, len(input)):
-			print('%d | %d\n' % (i, input[len].output))
+		for i in range(0, len(self.truthTable)):
+			print('%d | %d' % (i, self.truthTable[i]))
 			
 	def calculateEnergy(self):
 		''' Calculates energy of our system '''
 	
-		inputEntropy = 0
-		outputEntropy = 0
+		if self.inputsOcurrNum == 0:
+			return 0.0
+			
+		# Entropies are -sum(c*log2(c))/total, plus log2(total) on both.
+		# As this factor is equal on both, we don't really need to add it
+		inputEntropy = -entropySum(self.occurrences)/self.inputsOcurrNum
+		outputEntropy = -entropySum(self.outputOccurr)/self.inputsOcurrNum
+			
+		return (inputEntropy-outputEntropy)
+		
+	def isLazy(self):
+		''' Whether outputs are computed by the gate function instead of stored '''
+		return isinstance(self.truthTable, FunctionTable)
 		
-		if self.inputsOcurrNum != 0:
-			for i in self.input:
-				if i.getOcurrence() != 0:
-					inputEntropy -= log2(i.getOcurrence())*i.getOcurrence()/self.inputsOcurrNum
+	def buildTruthTable(self):
+		''' Stores the truth table of a lazy gate, computing every entry '''
 		
-			for i in self.outputOccurr:
-				if i != 0:
-					outputEntropy -= log2(i)*i/self.inputsOcurrNum
+		if self.isLazy():
+			table = _tables.get(self._typeKey())
+			if table is None:
+				table = internTable(array(_tableTypecode(self.nbitsOutput),\
+				map(self._function, range(0, self.getInputNum()))), self._typeKey())
+			self.truthTable = table
 			
-			# As this factor is equal on both, we don't really need to add it
-			# inputEntropy += log2(self.inputsOcurrNum)
-			# outputEntropy += log2(self.inputsOcurrNum)
+		return self.truthTable
+		
+	def _typeKey(self):
+		''' Key of the interned table of this gate type and widths '''
+		return (type(self), self.nbitsInput, self.nbitsOutput)
+		
+	def _internOutputs(self):
+		''' Shares the truth table of this gate type and widths, creating it
+		(with _createOutputs) only for the first gate. For subclasses whose
+		outputs only depend on their widths '''
+		
+		if self.isLazy():
+			return
 			
-		return (inputEntropy-outputEntropy)
+		table = _tables.get(self._typeKey())
+		if table is None:
+			self._createOutputs()
+			table = internTable(self.truthTable, self._typeKey())
+			
+		self.truthTable = table
+		
+	def isSparse(self):
+		''' Whether only the observed gate entries are kept '''
+		return isinstance(self.occurrences, SparseCounts)
 		
 	def _addOutputValue(self, input, output):
 		''' Adds an output value to given input '''
-		self.input[input].setOutput(output)
+		self.truthTable[input] = output
 		
-	def __applyInputBit(self, circuitid, input, bit):
-		''' Applies a input to a given input bit '''
+	@staticmethod
+	def _minterms(words, mask):
+		''' Given one word per input bit (one input per word bit), returns one
+		word per input combination, with the bits where that combination occurs '''
 		
-		# Apply bit to input signal
-		self.inputSignal += input << bit;
+		terms = [mask]
 		
-		# Bit is updated
-		self.updatedBits += 1 << bit;
-		
-		# All bits were updated, so updates connected gates
-		if self.updatedBits == (1 << self.nbitsInput)-1:
+		# Each new input bit is the most significant bit of the combination
+		for word in words:
+			notword = ~word & mask
+			terms = [t & notword for t in terms] + [t & word for t in terms]
 			
-			# Sets current output signal to output of current input
-			self.outputSignal = self.input[self.inputSignal].getOutput()
+		return terms
+		
+	@staticmethod
+	def _observedMinterms(words, mask):
+		''' As _minterms, but only the combinations that occur, as a dict
+		{combination : word}. It never has more entries than bits in mask '''
+		
+		terms = {0 : mask}
+		
+		for bit in range(0, len(words)):
+			word = words[bit]
+			notword = ~word & mask
+			following = {}
 			
-			# Updates all outputs
-			self.__updateOutputs(circuitid)
+			for combination, term in terms.items():
+				if term & notword:
+					following[combination] = term & notword
+				if term & word:
+					following[combination | (1 << bit)] = term & word
+					
+			terms = following
 			
-			# New input occurence
-			self.addInputOcurrence()
+		return terms
+		
+	def _evaluateWords(self, words, mask):
+		''' Evaluates many inputs at once, given one word per input bit.
+		Returns one word per output bit. Uses the truth table, subclasses
+		may override it with bitwise logic '''
 		
-	def applyInput(self, circuitid, input):
-		''' Applies a input to all input bits '''
+		outputs = [0]*self.nbitsOutput
 		
-		assert input >= 0 and input < self.getInputNum(), "[ERROR] INVALID INPUT (" + input + ")"
+		for combination, term in self._observedMinterms(words, mask).items():
+			output = self.truthTable[combination]
+			for bit in range(0, self.nbitsOutput):
+				if (output >> bit) & 1:
+					outputs[bit] |= term
 		
-		# All bits are updated
-		self.updatedBits = ~0
+		return outputs
+		
+	def applyInput(self, input):
+		''' Applies a input to all input bits of this gate alone.
+		Propagation through a circuit is done by its LogicDiagram '''
+		
+		assert input >= 0 and input < self.getInputNum(), "[ERROR] INVALID INPUT (" + str(input) + ")"
 
 		# Sets current input signal
 		self.inputSignal = input
 		
 		# Sets current output signal to output of current input
-		self.outputSignal = self.input[input].getOutput()
-		
-		# Updates all outputs
-		self.__updateOutputs(circuitid)
+		self.outputSignal = self.truthTable[input]
 		
 		# New input occurence
 		self.addInputOcurrence()
-	
-	def __updateOutputs(self, circuitid):
-		''' Updates outputs '''
-		# Applies the signal to all gates connected to the output
-		for i in range(0, len(self.outputBits)):
-			for j in self.outputBits[i]:
-				# Creates a mask to apply the correct signal
-				mask = (self.outputSignal & (1 << i)) >> i
-				LogicGate.gateList[circuitid][j.getGateName()].__applyInputBit(circuitid, mask, j.getInputBit())
-	
-	def update(self):
-		''' Gate needs new update '''
-	
-		# All bits needs update
-		self.updatedBits = 0
 		
-		# Resets input signal
-		self.inputSignal = 0;
-		
-	def connectOutput(self, circuitid, gateOutputBit, gateInputBit, gateName):
-		''' Connects an output to an input '''
-	
-		op = self.OutputBit(gateName, gateInputBit)
-		self.outputBits[gateOutputBit].append(op)
+		return self.outputSignal
 		
 	def resetInputs(self):
 	
 		# Total of ocurrences of inputs and outputs is 0
 		self.inputsOcurrNum = 0
 		
-		# All bits needs update
-		self.updatedBits = 0
-		
-		# All input ocurrences are 0
-		for i in self.input:
-			i.resetOcurrence()
-		
-		# All output ocurrences are 0
-		self.outputOccurr = [0]*(1<<self.nbitsOutput)
+		# All input and output ocurrences are 0
+		self.occurrences = newCounts(self.nbitsInput)
+		self.outputOccurr = newCounts(self.nbitsOutput)
 			
 	def getInputNum(self):
 		''' Get number of possible inputs '''
@@ -235,5 +425,14 @@ class LogicGate(ABC):
 		
 		pass
 		
+def _tableTypecode(nbits):
+	''' Smallest array typecode holding nbits unsigned bits '''
+	
+	for typecode in ('B', 'H', 'L', 'Q'):
+		if nbits <= 8*array(typecode).itemsize:
+			return typecode
+			
+	assert False, "[ERROR] TOO MANY OUTPUT BITS (" + str(nbits) + ")"
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,202 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from LogicGate import LogicGate, FunctionTable, newCounts, entropySum, xlog2x, _tableTypecode
+from BasicGates import BUFFERGate
+
+# Modules with up to this many inputs are collapsed into tables, wider
+# ones are flattened into their gates on each instance
+MODULE_BITS = 16
+
+class Module:
+    ''' A subcircuit collapsed into tables, built once and shared by all its
+        instances. truthTable has the module output of each module input and
+        each leaf gate inside it (gates of nested modules included, buffers
+        left out, as they give no energy) is a tuple (nbitsInput, nbitsOutput,
+        inputMap, outputMap), the maps having the leaf local input and output
+        of each module input. So the energy of an instance only depends on the
+        occurrences of its own inputs '''
+
+    # Class constructor
+    def __init__(self, name, circuit):
+
+        compiled = circuit.compile()
+
+        assert compiled.nbitsInput <= MODULE_BITS, "[ERROR] MODULE " + name + " IS TOO WIDE TO COLLAPSE"
+        assert compiled.outputGate != None, "[ERROR] MODULE " + name + " HAS NO OUTPUTS"
+
+        self.name = name
+        self.nbitsInput = compiled.nbitsInput
+        self.nbitsOutput = circuit.nbitsOutput
+        self.truthTable = None
+        self.leaves = []
+
+        for k, local in _localInputs(compiled):
+            gate = compiled.gates[k]
+
+            # The outputs port local input is the module output
+            if k == compiled.outputGate:
+                self.truthTable = _map(local, self.nbitsOutput)
+            elif k == 0 or isinstance(gate, BUFFERGate):
+                continue
+            elif isinstance(gate, MODULEGate):
+                for nbitsInput, nbitsOutput, inputMap, outputMap in gate.module.leaves:
+                    self.leaves.append((nbitsInput, nbitsOutput, _map(_gather(inputMap, local), nbitsInput),\
+                    _map(_gather(outputMap, local), nbitsOutput)))
+            else:
+                self.leaves.append((gate.nbitsInput, gate.nbitsOutput, _map(local, gate.nbitsInput),\
+                _map(_gather(gate.truthTable, local), gate.nbitsOutput)))
+
+    def entropySums(self, counts):
+        ''' Sums of c*log2(c) of the input and of the output occurrences of
+            every leaf, given the occurrences (or probabilities) of each module
+            input, as a sequence of 2^nbitsInput numbers '''
+
+        inputSum = 0.0
+        outputSum = 0.0
+
+        if np != None:
+            weights = np.asarray(counts, dtype = np.float64)
+            for _, _, inputMap, outputMap in self.leaves:
+                inputSum += entropySum(np.bincount(np.asarray(inputMap), weights = weights))
+                outputSum += entropySum(np.bincount(np.asarray(outputMap), weights = weights))
+
+            return inputSum, outputSum
+
+        observed = [(i, c) for i, c in enumerate(counts) if c]
+        for _, _, inputMap, outputMap in self.leaves:
+            inputs = {}
+            outputs = {}
+            for i, c in observed:
+                inputs[inputMap[i]] = inputs.get(inputMap[i], 0) + c
+                outputs[outputMap[i]] = outputs.get(outputMap[i], 0) + c
+            inputSum += sum(xlog2x(c) for c in inputs.values())
+            outputSum += sum(xlog2x(c) for c in outputs.values())
+
+        return inputSum, outputSum
+
+    def leafOccurrences(self, counts):
+        ''' Input and output occurrences of every leaf, as a list of
+            [inputs, outputs] pairs, for the occurrences of each module input '''
+
+        occurrences = []
+        for nbitsInput, nbitsOutput, _, _ in self.leaves:
+            occurrences.append([newCounts(nbitsInput), newCounts(nbitsOutput)])
+
+        for i in range(0, len(counts)):
+            if counts[i]:
+                for j in range(0, len(self.leaves)):
+                    occurrences[j][0][self.leaves[j][2][i]] += counts[i]
+                    occurrences[j][1][self.leaves[j][3][i]] += counts[i]
+
+        return occurrences
+
+    def step(self, occurrences, input, step):
+        ''' Adds step to the leaf occurrences (see leafOccurrences) of a module
+            input, returning the change of both sums of c*log2(c) '''
+
+        inputChange = 0.0
+        outputChange = 0.0
+
+        for j in range(0, len(self.leaves)):
+            inputs, outputs = occurrences[j]
+
+            local = self.leaves[j][2][input]
+            ocurrences = inputs[local]
+            inputs[local] = ocurrences + step
+            inputChange += xlog2x(ocurrences + step) - xlog2x(ocurrences)
+
+            output = self.leaves[j][3][input]
+            ocurrences = outputs[output]
+            outputs[output] = ocurrences + step
+            outputChange += xlog2x(ocurrences + step) - xlog2x(ocurrences)
+
+        return inputChange, outputChange
+
+class MODULEGate(LogicGate):
+    ''' Instance of a Module. It is evaluated with one lookup on the module
+        truth table (shared by every instance) and its energy is the energy of
+        every gate inside the module '''
+
+    __slots__ = ('module',)
+
+    def __init__(self, name, module):
+
+        # Base class constructor with the module table
+        super().__init__(name, module.nbitsInput, module.nbitsOutput, module.truthTable)
+
+        self.module = module
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['module'] = self.module
+
+        return state
+
+    def calculateEnergy(self):
+        ''' Energy of the gates inside the module '''
+
+        if self.inputsOcurrNum == 0:
+            return 0.0
+
+        return self.energyOf(self.occurrences)
+
+    def energyOf(self, counts):
+        ''' Energy of the gates inside the module for the given occurrences (or
+            probabilities) of each module input '''
+
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+
+        inputSum, outputSum = self.module.entropySums(counts)
+
+        return (outputSum - inputSum)/total
+
+    def _createOutputs(self):
+        ''' Does nothing, the table comes from the module '''
+        pass
+
+def _localInputs(compiled):
+    ''' Yields each compiled gate id with the local input of the gate for
+        every circuit input (NumPy arrays, or lists without NumPy) '''
+
+    total = 1 << compiled.nbitsInput
+
+    if np != None:
+        yield from compiled.localInputs(np.arange(total, dtype = np.int64))
+        return
+
+    locals = [compiled.localsOf(i) for i in range(0, total)]
+    for k in range(0, len(compiled.gates)):
+        yield k, [l[k] for l in locals]
+
+def _gather(table, local):
+    ''' Entries of a table for each local input '''
+
+    if np != None:
+        return np.fromiter((table[l] for l in local.tolist()), dtype = np.uint64, count = len(local))\
+        if isinstance(table, FunctionTable) else np.asarray(table)[local]
+
+    return [table[l] for l in local]
+
+def _map(values, nbits):
+    ''' Array of values of nbits, in the smallest type that fits '''
+
+    typecode = _tableTypecode(nbits)
+
+    if np == None:
+        return array(typecode, values)
+
+    values = np.asarray(values).astype(np.dtype(typecode))
+    table = array(typecode)
+    table.frombytes(values.tobytes())
+
+    return table
+
+if __name__ == "__main__":
+    pass
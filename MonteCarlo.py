@@ -0,0 +1,235 @@
+from concurrent.futures import ProcessPoolExecutor
+from math import log, sqrt
+from statistics import NormalDist
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from BasicGates import BUFFERGate
+from LogicGate import entropySum
+from Module import MODULEGate
+
+# Random inputs evaluated at once
+BATCH = 1 << 16
+
+def sampleEnergy(compiled, nMax, relTol = 0.01, seed = None, workers = 1, batch = BATCH, confidence = 0.95):
+    ''' Estimates the energy of a compiled circuit over uniformly random inputs,
+        drawing batches until the confidence interval half width is within
+        relTol of the estimate, or nMax inputs were drawn. With more than one
+        worker, batches are also drawn on a process pool. Batch b always has
+        batch inputs (but the last one), drawn from its own seed (seed, b), and
+        batches are added in order, so a seed gives the same estimate with any
+        number of workers. Returns (energy, half width, inputs drawn).
+
+        The energy of a gate is H(local input) - H(output) = H(local input | output),
+        the mean of -log2 p(local input | output) over the inputs. Its plug-in
+        estimate gets the Miller-Madow bias correction and the interval comes
+        from the variance of that score (delta method) over every batch, each
+        batch scored with its own histograms '''
+
+    assert np != None, "[ERROR] NUMPY IS REQUIRED FOR sampleEnergy"
+    assert compiled.nbitsInput <= 63, "[ERROR] TOO MANY INPUTS TO SAMPLE (" + str(compiled.nbitsInput) + ")"
+    assert nMax > 0 and batch > 0 and workers > 0, "[ERROR] INVALID SAMPLE SIZE"
+
+    z = NormalDist().inv_cdf((1 + confidence)/2)
+    entropy = np.random.SeedSequence(seed).entropy
+    batches = -(-nMax//batch)
+    hist = _histograms(compiled)
+    samples = 0
+    energy = 0.0
+    halfWidth = float('inf')
+
+    # Mean and sum of squared deviations of the scores so far
+    mean = squares = 0.0
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers - 1, initializer = _initWorker, initargs = (compiled,))
+
+    try:
+        index = 0
+        while index < batches:
+
+            # Next batch of each worker, this process taking the first one
+            indexes = range(index, min(index + workers, batches))
+            futures = []
+            if executor != None:
+                futures = [executor.submit(_sampleTask, entropy, b, min(batch, nMax - b*batch)) for b in indexes[1:]]
+
+            results = [_sampleBatch(compiled, entropy, indexes[0], min(batch, nMax - indexes[0]*batch))]
+            results.extend(future.result() for future in futures)
+
+            # Adds them in order, until the interval is small enough
+            for other, size, batchMean, batchSquares in results:
+                index += 1
+                _merge(hist, other)
+
+                delta = batchMean - mean
+                mean += delta*size/(samples + size)
+                squares += batchSquares + delta*delta*samples*size/(samples + size)
+                samples += size
+
+                energy = _energy(compiled, hist, samples)
+                if samples > 1:
+                    halfWidth = z*sqrt(squares/(samples - 1))/sqrt(samples)
+
+                if halfWidth <= relTol*abs(energy):
+                    return energy, halfWidth, samples
+
+    finally:
+        if executor != None:
+            executor.shutdown()
+
+    return energy, halfWidth, samples
+
+def _draw(compiled, seed, size):
+    ''' Uniformly random inputs '''
+
+    rng = np.random.default_rng(seed)
+
+    return rng.integers(0, 1 << compiled.nbitsInput, size, dtype = np.uint64)
+
+def _histograms(compiled):
+    ''' Empty (input, output) occurrences of every compiled gate, dense arrays or
+        sparse dicts as the gate keeps them. Buffers (and the ports) give no energy
+        and get None '''
+
+    hist = []
+
+    for gate in compiled.gates:
+        if isinstance(gate, BUFFERGate):
+            hist.append(None)
+        elif gate.isSparse():
+            hist.append(({}, {}))
+        else:
+            hist.append((np.zeros(gate.getInputNum(), dtype = np.int64), np.zeros(gate.getOutputNum(), dtype = np.int64)))
+
+    return hist
+
+def _addBatch(compiled, vectors, hist, score = False):
+    ''' Adds the occurrences of a batch of inputs to the histograms. If score,
+        returns the -log2 p(local input | output) of each input summed over the
+        gates, with the updated histograms '''
+
+    scores = np.zeros(len(vectors)) if score else None
+
+    for k, local in compiled.localInputs(vectors):
+        if hist[k] == None:
+            continue
+
+        inputs, outputs = hist[k]
+        output = compiled._lookup(compiled.tableIndex[k], local)
+
+        if isinstance(inputs, dict):
+            inputCount = _addSparse(inputs, local)
+            outputCount = _addSparse(outputs, output)
+        else:
+            local = local.astype(np.intp)
+            output = output.astype(np.intp)
+            inputs += np.bincount(local, minlength = len(inputs))
+            outputs += np.bincount(output, minlength = len(outputs))
+            inputCount = inputs[local]
+            outputCount = outputs[output]
+
+        if score and isinstance(compiled.gates[k], MODULEGate):
+            for (inputCounts, outputCounts), (_, _, inputMap, outputMap) in\
+            zip(_leafHistograms(compiled.gates[k], inputs), compiled.gates[k].module.leaves):
+                scores += np.log2(outputCounts[np.asarray(outputMap)[local]]) - np.log2(inputCounts[np.asarray(inputMap)[local]])
+        elif score:
+            scores += np.log2(outputCount) - np.log2(inputCount)
+
+    return scores
+
+def _addSparse(counts, values):
+    ''' Adds an array of values to a dict of occurrences, returning the
+        (updated) occurrences of each value '''
+
+    unique, inverse, occurrences = np.unique(values, return_inverse = True, return_counts = True)
+
+    updated = []
+    for value, ocurrences in zip(unique.tolist(), occurrences.tolist()):
+        counts[value] = counts.get(value, 0) + ocurrences
+        updated.append(counts[value])
+
+    return np.array(updated, dtype = np.float64)[inverse.ravel()]
+
+def _merge(hist, other):
+    ''' Adds the histograms of another batch '''
+
+    for k in range(0, len(hist)):
+        if hist[k] == None:
+            continue
+
+        for counts, others in zip(hist[k], other[k]):
+            if isinstance(counts, dict):
+                for value, ocurrences in others.items():
+                    counts[value] = counts.get(value, 0) + ocurrences
+            else:
+                counts += others
+
+def _energy(compiled, hist, samples):
+    ''' Miller-Madow corrected energy of the histograms of samples inputs.
+        Module instances give the energy of the gates inside them '''
+
+    energy = 0.0
+
+    for k in range(0, len(hist)):
+        if hist[k] == None:
+            continue
+
+        if isinstance(compiled.gates[k], MODULEGate):
+            leaves = _leafHistograms(compiled.gates[k], hist[k][0])
+        else:
+            leaves = [hist[k]]
+
+        for leaf in leaves:
+            inputs, outputs = (_nonzero(counts) for counts in leaf)
+
+            # Entropy difference, plus (bins - 1)/2N nats on each side
+            energy += (entropySum(outputs) - entropySum(inputs))/samples
+            energy += (len(inputs) - len(outputs))/(2*samples*log(2))
+
+    return energy
+
+def _leafHistograms(gate, counts):
+    ''' Input and output occurrences of each gate inside a module instance,
+        given the occurrences of the module inputs '''
+
+    return [(np.bincount(np.asarray(inputMap), weights = counts), np.bincount(np.asarray(outputMap), weights = counts))\
+    for _, _, inputMap, outputMap in gate.module.leaves]
+
+def _nonzero(counts):
+    ''' Non zero occurrences as a float array '''
+
+    if isinstance(counts, dict):
+        counts = np.fromiter(counts.values(), dtype = np.float64, count = len(counts))
+
+    return counts[counts != 0].astype(np.float64)
+
+# Compiled circuit of this worker process
+_worker = {}
+
+def _initWorker(compiled):
+    ''' Keeps the compiled circuit of this worker '''
+
+    _worker['compiled'] = compiled
+
+def _sampleTask(entropy, index, size):
+    ''' _sampleBatch on the compiled circuit of this worker '''
+    return _sampleBatch(_worker['compiled'], entropy, index, size)
+
+def _sampleBatch(compiled, entropy, index, size):
+    ''' Histograms of batch index of random inputs (drawn from the seed entropy
+        and the batch index), its size and the mean and sum of squared
+        deviations of its scores '''
+
+    hist = _histograms(compiled)
+    scores = _addBatch(compiled, _draw(compiled, np.random.SeedSequence(entropy, spawn_key = (index,)), size), hist, True)
+    mean = float(scores.mean())
+
+    return hist, size, mean, float(((scores - mean)**2).sum())
+
+if __name__ == "__main__":
+    pass
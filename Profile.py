@@ -0,0 +1,77 @@
+from time import perf_counter
+
+# Phases timed by a profile
+PHASES = ('propagate', 'update', 'accounting', 'entropy')
+
+class Profile:
+    ''' Counters and timers of a profiled compiled circuit: evaluations and
+        time of each gate, value changes (events) of each net and time of each
+        phase: propagate (local inputs and outputs of the gates), update
+        (output nets), accounting (occurrences) and entropy '''
+
+    # Class constructor
+    def __init__(self, compiled):
+
+        self.compiled = compiled
+        self.evaluations = [0]*len(compiled.gates)
+        self.gateTime = [0.0]*len(compiled.gates)
+        self.events = [0]*len(compiled.nets)
+        self.times = {phase : 0.0 for phase in PHASES}
+
+    def total(self):
+        ''' Time of every phase '''
+
+        return sum(self.times.values())
+
+    def timed(self, function, phase):
+        ''' function, adding the time of its calls to phase, without the
+            time of the (profiled) phases inside it '''
+
+        def timedFunction(*args, **kwargs):
+            start = perf_counter()
+            inner = self.total()
+            result = function(*args, **kwargs)
+            self.times[phase] += perf_counter() - start - (self.total() - inner)
+            return result
+
+        return timedFunction
+
+    def stats(self):
+        ''' Counters as a dict: time per phase and, per gate in level order,
+            its evaluations, time and events of each output net '''
+
+        compiled = self.compiled
+        gates = []
+
+        for k in range(0, len(compiled.gates)):
+            gate = compiled.gates[k]
+            base = compiled.netBase[k]
+            gates.append({
+                'name' : gate.name,
+                'type' : type(gate).__name__,
+                'evaluations' : self.evaluations[k],
+                'time' : self.gateTime[k],
+                'events' : self.events[base:base + gate.nbitsOutput]
+            })
+
+        return {'phases' : dict(self.times), 'gates' : gates}
+
+def formatStats(stats, top = 10):
+    ''' Text table of the phases and of the top gates by time '''
+
+    lines = ['%-12s %12s' % ('phase', 'seconds')]
+    for phase in PHASES:
+        lines.append('%-12s %12.6f' % (phase, stats['phases'][phase]))
+
+    lines.append('')
+    lines.append('%-24s %-12s %12s %12s %12s' % ('gate', 'type', 'evaluations', 'seconds', 'events'))
+
+    gates = sorted(stats['gates'], key = lambda gate: gate['time'], reverse = True)
+    for gate in gates[0:top]:
+        lines.append('%-24s %-12s %12d %12.6f %12d' % (gate['name'][0:24], gate['type'], gate['evaluations'],\
+        gate['time'], sum(gate['events'])))
+
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    pass
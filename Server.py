@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from LogicDiagram import readCircuitJSON
+from Trace import applyBatch
+import Sweep
+
+# Requests of a connection read at most this long (bytes, one JSON per line)
+LINE_LIMIT = 1 << 26
+
+# Requests served
+OPS = ('load', 'apply', 'energy', 'reset', 'sweep', 'unload', 'circuits')
+
+class Resident:
+    ''' A circuit kept loaded by the server. Its requests run in arrival order
+        on one task, consecutive apply requests (from any client) being merged
+        into one batched evaluation '''
+
+    # Class constructor
+    def __init__(self, path, digest, circuit):
+
+        self.path = path
+        self.digest = digest
+        self.circuit = circuit
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, op, request):
+        ''' Queues a request, returning a future of its result '''
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((op, request, future))
+
+        return future
+
+    async def _run(self):
+        ''' Serves the queued requests '''
+
+        loop = asyncio.get_running_loop()
+
+        pending = []
+
+        try:
+            while True:
+                pending = [await self.queue.get()]
+                while not self.queue.empty():
+                    pending.append(self.queue.get_nowait())
+
+                await self._serve(loop, pending)
+
+        except asyncio.CancelledError:
+            _fail(pending, '[ERROR] CIRCUIT UNLOADED')
+            raise
+
+    async def _serve(self, loop, pending):
+        ''' Serves a list of requests, taking them out once done '''
+
+        while pending:
+
+            # Consecutive applies become one batch
+            if pending[0][0] == 'apply':
+                count = 0
+                while count < len(pending) and pending[count][0] == 'apply':
+                    count += 1
+                await self._apply(loop, pending[0:count])
+                del pending[0:count]
+                continue
+
+            op, request, future = pending[0]
+            try:
+                result = await loop.run_in_executor(None, self._execute, op, request)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            del pending[0]
+
+    async def _apply(self, loop, group):
+        ''' Applies the vectors of a group of apply requests at once. Each
+            request is checked first, so an invalid one only fails itself '''
+
+        nbits = self.circuit.getInputNumber()
+        valid = []
+        vectors = []
+
+        for op, request, future in group:
+            try:
+                _checkVectors(request['vectors'], nbits)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                valid.append((op, request, future))
+                vectors.extend(request['vectors'])
+
+        group = valid
+        if not group:
+            return
+
+        try:
+            if vectors:
+                await loop.run_in_executor(None, applyBatch, self.circuit, vectors)
+            self.batches += 1
+        except Exception as error:
+            for _, _, future in group:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for _, request, future in group:
+            if not future.done():
+                future.set_result({'applied' : len(request['vectors']), 'batched' : len(vectors)})
+
+    def _execute(self, op, request):
+        ''' Runs a request other than apply, on an executor thread '''
+
+        if op == 'energy':
+            return {'energy' : self.circuit.calculateEnergy()}
+
+        if op == 'reset':
+            self.circuit.resetInputs()
+            return {}
+
+        assert False, "[ERROR] UNKNOWN REQUEST (" + str(op) + ")"
+
+    def close(self):
+        ''' Stops serving, cancelling the queued requests. The circuit is
+            freed once an evaluation still running on it ends '''
+
+        self.task.cancel()
+
+        queued = []
+        while not self.queue.empty():
+            queued.append(self.queue.get_nowait())
+        _fail(queued, '[ERROR] CIRCUIT UNLOADED')
+
+class Server:
+    ''' Keeps circuits loaded, keyed by path and content hash, and serves
+        requests on them: one JSON object per line, each answered by one line
+        with the same id and either its result or an error.
+
+            {"id": 1, "op": "load", "circuit": "adder.json"}
+            {"id": 2, "op": "apply", "circuit": "adder.json", "vectors": [0, 5, 3]}
+            {"id": 3, "op": "energy", "circuit": "adder.json"}
+            {"id": 4, "op": "reset", "circuit": "adder.json"}
+            {"id": 5, "op": "sweep", "circuit": "adder.json", "sizes": [2]}
+            {"id": 6, "op": "unload", "circuit": "adder.json"}
+            {"id": 7, "op": "circuits"}
+
+        Editing a circuit file loads it again, dropping the old one. Sweeps
+        run on a process pool, everything else on executor threads, so the
+        event loop never blocks '''
+
+    # Class constructor
+    def __init__(self, workers = None):
+
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+        # Resident circuits by (path, digest), the digest of each path and
+        # the loads in progress
+        self.residents = {}
+        self.digests = {}
+        self.loading = {}
+
+    async def resident(self, path):
+        ''' Resident circuit of a file, loading it if needed '''
+
+        loop = asyncio.get_running_loop()
+        path = os.path.realpath(path)
+        digest = await loop.run_in_executor(None, self._digest, path)
+        key = (path, digest)
+
+        if key in self.residents:
+            return self.residents[key]
+
+        # Concurrent requests wait for the same load
+        if key not in self.loading:
+            self.loading[key] = loop.run_in_executor(None, readCircuitJSON, path)
+
+        try:
+            circuit = await self.loading[key]
+        finally:
+            self.loading.pop(key, None)
+
+        if key not in self.residents:
+            for old in [k for k in self.residents if k[0] == path]:
+                self.residents.pop(old).close()
+            self.residents[key] = Resident(path, digest, circuit)
+
+        return self.residents[key]
+
+    def _digest(self, path):
+        ''' Content hash of a file, only read again when its size or time change '''
+
+        status = os.stat(path)
+        stamp = (status.st_mtime_ns, status.st_size)
+
+        if path not in self.digests or self.digests[path][0] != stamp:
+            with open(path, 'rb') as f:
+                self.digests[path] = (stamp, hashlib.sha256(f.read()).hexdigest())
+
+        return self.digests[path][1]
+
+    async def handle(self, request):
+        ''' Result of a request '''
+
+        op = request.get('op')
+        assert op in OPS, "[ERROR] UNKNOWN REQUEST (" + str(op) + ")"
+
+        if op == 'circuits':
+            return [{'circuit' : path, 'digest' : digest, 'batches' : self.residents[(path, digest)].batches}\
+            for path, digest in self.residents]
+
+        assert 'circuit' in request, "[ERROR] REQUEST WITHOUT CIRCUIT"
+
+        if op == 'sweep':
+            assert isinstance(request.get('sizes'), list), "[ERROR] SWEEP REQUEST WITHOUT SIZES"
+            return await self._sweep(request['circuit'], request['sizes'])
+
+        if op == 'unload':
+            path = os.path.realpath(request['circuit'])
+            for key in [k for k in self.residents if k[0] == path]:
+                self.residents.pop(key).close()
+            return {}
+
+        resident = await self.resident(request['circuit'])
+
+        if op == 'load':
+            return {'circuit' : resident.path, 'digest' : resident.digest, 'inputs' : resident.circuit.getInputNumber()}
+
+        if op == 'apply':
+            assert isinstance(request.get('vectors'), list), "[ERROR] APPLY REQUEST WITHOUT VECTORS"
+
+        return await resident.submit(op, request)
+
+    async def _sweep(self, path, sizes):
+        ''' Sweep of a resident circuit, its shards spread on the process
+            pool. Each worker keeps the last circuit it loaded, by digest '''
+
+        resident = await self.resident(path)
+        ninputs = 1 << resident.circuit.getInputNumber()
+        shards = Sweep.shards(ninputs, sizes, self.workers*Sweep.SHARDS_PER_WORKER)
+
+        if self.executor == None:
+            self.executor = ProcessPoolExecutor(self.workers)
+
+        loop = asyncio.get_running_loop()
+        key = (resident.path, resident.digest)
+
+        results = {size : Sweep.SweepResult(size) for size in sizes}
+        for result in await asyncio.gather(*[loop.run_in_executor(self.executor, Sweep.sweepShard,\
+        resident.path, shard, key) for shard in shards]):
+            results[result.size].merge(result)
+
+        return [results[size].toJSON() for size in sizes]
+
+    async def connection(self, reader, writer):
+        ''' Serves the requests of one client, answering each as soon as it is
+            done (not necessarily in order) '''
+
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(request):
+            response = {'id' : request.get('id')}
+            try:
+                response['result'] = await self.handle(request)
+            except Exception as error:
+                response['error'] = str(error) or type(error).__name__
+
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    request = {'op' : None}
+
+                task = asyncio.get_running_loop().create_task(answer(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions = True)
+
+        except ConnectionError:
+            pass
+
+        finally:
+            writer.close()
+
+    def close(self):
+        ''' Frees every resident circuit and the process pool '''
+
+        for resident in self.residents.values():
+            resident.close()
+        self.residents = {}
+
+        if self.executor != None:
+            self.executor.shutdown()
+            self.executor = None
+
+def _fail(requests, message):
+    ''' Ends the futures of queued requests with an error '''
+
+    for _, _, future in requests:
+        if not future.done():
+            future.set_exception(RuntimeError(message))
+
+def _checkVectors(vectors, nbits):
+    ''' Asserts that every vector of an apply request is an input of nbits '''
+
+    assert all(type(vector) is int for vector in vectors), "[ERROR] INVALID INPUT"
+    assert not vectors or (min(vectors) >= 0 and max(vectors) >> nbits == 0), "[ERROR] INVALID INPUT"
+
+async def serve(socket = None, host = '127.0.0.1', port = 0, workers = None, started = None):
+    ''' Runs a server on a Unix socket (if given) or on a local TCP port until
+        cancelled. started, if given, is called with the listening address '''
+
+    server = Server(workers)
+
+    if socket != None:
+        listener = await asyncio.start_unix_server(server.connection, socket, limit = LINE_LIMIT)
+        address = socket
+    else:
+        listener = await asyncio.start_server(server.connection, host, port, limit = LINE_LIMIT)
+        address = listener.sockets[0].getsockname()[0:2]
+
+    # Terminating the process also cleans up
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    if started != None:
+        started(address)
+
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+        if socket != None and os.path.exists(socket):
+            os.unlink(socket)
+
+def main(argv):
+    ''' Command line entry point '''
+
+    parser = argparse.ArgumentParser(description = 'Resident server of circuit evaluations')
+    parser.add_argument('--socket', default = None, help = 'Unix socket path (default: a local TCP port)')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'TCP address (default: 127.0.0.1)')
+    parser.add_argument('--port', type = int, default = 7411, help = 'TCP port (default: 7411)')
+    parser.add_argument('--workers', type = int, default = None, help = 'sweep processes (default: all cores)')
+    args = parser.parse_args(argv)
+
+    def started(address):
+        print('[SERVING] %s' % (address if args.socket != None else '%s:%d' % address), file = sys.stderr, flush = True)
+
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, args.workers, started))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
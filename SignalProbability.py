@@ -0,0 +1,142 @@
+from math import log2
+
+from BasicGates import BUFFERGate
+from Module import MODULEGate
+
+def estimateEnergy(compiled, probabilities, exactBits = 0):
+    ''' Estimates the energy of a compiled circuit for independent inputs, each
+        being 1 with the given probability (one per input bit), in one pass.
+        The 1-probability of every net is propagated in level order and each
+        gate local input distribution is the product of its fanin probabilities,
+        which is exact unless the fanins share inputs (reconvergent fanout).
+        Reconvergent gates depending on up to exactBits inputs get their exact
+        distribution, enumerating those inputs. Returns (energy, unsafe), unsafe
+        being the compiled ids of the reconvergent gates left estimated '''
+
+    nbitsInput = compiled.nbitsInput
+    assert len(probabilities) == nbitsInput, "[ERROR] INVALID SIZE FOR INPUT PROBABILITIES"
+    assert all(0 <= p <= 1 for p in probabilities), "[ERROR] INVALID INPUT PROBABILITY"
+
+    # 1-probability and input support (bit mask) of every net
+    probability = [0.0]*len(compiled.nets)
+    support = [0]*len(compiled.nets)
+    for i in range(0, nbitsInput):
+        probability[i] = float(probabilities[i])
+        support[i] = 1 << i
+
+    energy = 0.0
+    unsafe = []
+
+    for k in range(1, len(compiled.gates)):
+        gate = compiled.gates[k]
+        fanins = compiled.faninNet[compiled.faninStart[k]:compiled.faninStart[k+1]]
+        outnet = compiled.netBase[k]
+
+        # Fanins sharing some input are not independent
+        reconvergent = False
+        inputs = 0
+        for n in fanins:
+            if inputs & support[n]:
+                reconvergent = True
+            inputs |= support[n]
+
+        for bit in range(0, gate.nbitsOutput):
+            support[outnet + bit] = inputs
+
+        # Buffers just pass the probabilities, with equal entropies on both sides
+        if isinstance(gate, BUFFERGate):
+            for bit in range(0, gate.nbitsOutput):
+                probability[outnet + bit] = probability[fanins[bit]]
+            continue
+
+        # Local input distribution
+        if reconvergent and inputs.bit_count() <= exactBits:
+            distribution = _exactDistribution(compiled, k, inputs, probabilities)
+        else:
+            if reconvergent:
+                unsafe.append(k)
+            distribution = _productDistribution([probability[n] for n in fanins])
+
+        # Output distribution and output net probabilities
+        table = gate.truthTable
+        outputs = {}
+        for local in range(0, len(distribution)):
+            if distribution[local] != 0:
+                output = table[local]
+                outputs[output] = outputs.get(output, 0.0) + distribution[local]
+
+        for bit in range(0, gate.nbitsOutput):
+            probability[outnet + bit] = sum(p for output, p in outputs.items() if (output >> bit) & 1)
+
+        # Module instances give the energy of the gates inside them
+        if isinstance(gate, MODULEGate):
+            energy += gate.energyOf(distribution)
+        else:
+            energy += _entropy(distribution) - _entropy(outputs.values())
+
+    return energy, unsafe
+
+def _productDistribution(probabilities):
+    ''' Distribution of the local input of independent bits '''
+
+    distribution = [1.0]
+
+    # Each new bit is the most significant bit of the local input
+    for p in probabilities:
+        distribution = [d*(1 - p) for d in distribution] + [d*p for d in distribution]
+
+    return distribution
+
+def _exactDistribution(compiled, k, inputs, probabilities):
+    ''' Distribution of the local input of a compiled gate, enumerating the
+        inputs (bit mask) it depends on, bit-parallel '''
+
+    bits = [i for i in range(0, compiled.nbitsInput) if (inputs >> i) & 1]
+    count = 1 << len(bits)
+    mask = (1 << count) - 1
+
+    # One word bit per assignment of the inputs
+    net = {}
+    words = compiled.exhaustiveWords(0, count)
+    for j in range(0, len(bits)):
+        net[bits[j]] = words[j]
+
+    # Fanin cone of the gate, in level order
+    cone = set()
+    stack = [k]
+    while stack:
+        g = stack.pop()
+        for n in compiled.faninNet[compiled.faninStart[g]:compiled.faninStart[g+1]]:
+            if n not in net and compiled.netGate[n] not in cone:
+                cone.add(compiled.netGate[n])
+                stack.append(compiled.netGate[n])
+
+    for g in sorted(cone):
+        fanins = [net[n] for n in compiled.faninNet[compiled.faninStart[g]:compiled.faninStart[g+1]]]
+        outnet = compiled.netBase[g]
+        outputs = compiled.gates[g]._evaluateWords(fanins, mask)
+        for bit in range(0, len(outputs)):
+            net[outnet + bit] = outputs[bit]
+
+    # Probability of each assignment
+    weights = [1.0]
+    for i in bits:
+        p = float(probabilities[i])
+        weights = [w*(1 - p) for w in weights] + [w*p for w in weights]
+
+    gate = compiled.gates[k]
+    fanins = [net[n] for n in compiled.faninNet[compiled.faninStart[k]:compiled.faninStart[k+1]]]
+    distribution = [0.0]*gate.getInputNum()
+
+    for local, term in gate._observedMinterms(fanins, mask).items():
+        distribution[local] = sum(weights[a] for a in range(0, count) if (term >> a) & 1)
+
+    return distribution
+
+def _entropy(distribution):
+    ''' Entropy (bits) of a distribution '''
+
+    return -sum(p*log2(p) for p in distribution if p > 0)
+
+if __name__ == "__main__":
+    pass
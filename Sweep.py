@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+
+from LogicDiagram import readCircuitJSON
+from Combinations import unrankCombination, nextCombination
+
+class SweepResult:
+    ''' Reduced results of the subsets of one size: energy histogram,
+        subsets of minimum and maximum energy and number of "wires"
+        (subsets where every output is the same) '''
+
+    # Class constructor
+    def __init__(self, size, precision = 9):
+
+        self.size = size
+        self.precision = precision
+        self.subsets = 0
+        self.wires = 0
+        self.histogram = {}
+
+        # (energy, rank, subset)
+        self.min = None
+        self.max = None
+
+    def add(self, energy, rank, subset):
+        ''' Adds the energy of a subset '''
+
+        self.subsets += 1
+
+        key = round(energy, self.precision)
+        self.histogram[key] = self.histogram.get(key, 0) + 1
+
+        # Ties keep the subset with the lowest rank, whatever the sharding
+        if self.min == None or (energy, rank) < self.min[0:2]:
+            self.min = (energy, rank, subset)
+        if self.max == None or (-energy, rank) < (-self.max[0], self.max[1]):
+            self.max = (energy, rank, subset)
+
+    def addWire(self):
+        ''' Adds a subset where every output is the same '''
+
+        self.subsets += 1
+        self.wires += 1
+
+    def merge(self, other):
+        ''' Merges the results of another shard of the same size '''
+
+        self.subsets += other.subsets
+        self.wires += other.wires
+
+        for key, count in other.histogram.items():
+            self.histogram[key] = self.histogram.get(key, 0) + count
+
+        if other.min != None and (self.min == None or other.min[0:2] < self.min[0:2]):
+            self.min = other.min
+        if other.max != None and (self.max == None or (-other.max[0], other.max[1]) < (-self.max[0], self.max[1])):
+            self.max = other.max
+
+    def toJSON(self):
+        ''' Results as a JSON serializable dict '''
+
+        return {
+            'size' : self.size,
+            'subsets' : self.subsets,
+            'wires' : self.wires,
+            'histogram' : {repr(key) : self.histogram[key] for key in sorted(self.histogram)},
+            'min' : None if self.min == None else {'energy' : self.min[0], 'subset' : list(self.min[2])},
+            'max' : None if self.max == None else {'energy' : self.max[0], 'subset' : list(self.max[2])}
+        }
+
+# Shards of each subset size per worker
+SHARDS_PER_WORKER = 8
+
+# Workers keep the gate local inputs of every primary input while there
+# are at most this many of them (primary inputs times gates)
+LOCALS_LIMIT = 1 << 22
+
+# Circuit loaded once per worker process
+_worker = {}
+
+def _initWorker(filename, key = None):
+    ''' Loads and compiles the circuit of this worker, known by key (its
+        filename by default) '''
+
+    circuit = readCircuitJSON(filename)
+    compiled = circuit.compile()
+
+    # Gate local inputs and circuit output of every primary input, so the
+    # sweep steps do not evaluate the circuit again
+    ninputs = 1 << circuit.getInputNumber()
+    locals = [] if ninputs*len(compiled.gates) <= LOCALS_LIMIT else None
+    outputs = []
+
+    for i in range(0, ninputs):
+        local = compiled.localsOf(i)
+        outputs.append(local[compiled.outputGate])
+        if locals != None:
+            locals.append(local)
+
+    _worker['key'] = filename if key == None else key
+    _worker['circuit'] = circuit
+    _worker['locals'] = locals
+    _worker['outputs'] = outputs
+
+def sweepShard(filename, shard, key = None):
+    ''' Energy of a shard (see shards) on a worker process that keeps the
+        last circuit it loaded, so only a new key (a new file or content)
+        loads it again '''
+
+    if _worker.get('key') != (filename if key == None else key):
+        _initWorker(filename, key)
+
+    return _sweepShard(*shard)
+
+def _sweepShard(size, start, stop, precision):
+    ''' Energy of the subsets of the given size with ranks in [start, stop) '''
+
+    circuit = _worker['circuit']
+    locals = _worker['locals']
+    outputs = _worker['outputs']
+    ninputs = len(outputs)
+
+    result = SweepResult(size, precision)
+    circuit.resetInputs()
+
+    # Number of subset inputs giving each output
+    outputCount = {}
+
+    def add(i):
+        circuit.addVector(i, locals[i] if locals != None else None)
+        outputCount[outputs[i]] = outputCount.get(outputs[i], 0) + 1
+
+    def remove(i):
+        circuit.removeVector(i, locals[i] if locals != None else None)
+        outputCount[outputs[i]] -= 1
+        if outputCount[outputs[i]] == 0:
+            del outputCount[outputs[i]]
+
+    subset = unrankCombination(start, ninputs, size)
+    for i in subset:
+        add(i)
+
+    for rank in range(start, stop):
+
+        if len(outputCount) == 1:
+            result.addWire()
+        else:
+            result.add(circuit.calculateEnergy(), rank, subset)
+
+        if rank + 1 == stop:
+            break
+
+        # Lexicographic successor only changes a suffix of the subset
+        following = nextCombination(subset, ninputs)
+        for i in set(subset).difference(following):
+            remove(i)
+        for i in set(following).difference(subset):
+            add(i)
+        subset = following
+
+    return result
+
+def shards(ninputs, sizes, count, precision = 9):
+    ''' Rank ranges (size, start, stop, precision) splitting the subsets of
+        each size of ninputs primary inputs in at most count shards '''
+
+    result = []
+    for size in sizes:
+        assert 0 < size <= ninputs, "[ERROR] INVALID SUBSET SIZE (" + str(size) + ")"
+
+        total = comb(ninputs, size)
+        n = min(total, count)
+        for i in range(0, n):
+            result.append((size, total*i//n, total*(i+1)//n, precision))
+
+    return result
+
+def sweep(filename, sizes, workers = None, shardsPerWorker = SHARDS_PER_WORKER, precision = 9):
+    ''' Energy of every subset of the given sizes of the inputs of a circuit.
+        The combinations of each size are split in rank ranges, evaluated on a
+        process pool (the circuit is loaded once per worker) and reduced here.
+        Returns one SweepResult per size '''
+
+    workers = workers or os.cpu_count() or 1
+
+    # Number of inputs of the circuit
+    with open(filename, 'r') as f:
+        ninputs = 1 << len(json.load(f)['inputs'])
+
+    results = {size : SweepResult(size, precision) for size in sizes}
+
+    # Evaluates the shards on this process
+    if workers == 1:
+        _initWorker(filename)
+        for shard in shards(ninputs, sizes, shardsPerWorker, precision):
+            results[shard[0]].merge(_sweepShard(*shard))
+
+    else:
+        with ProcessPoolExecutor(workers, initializer = _initWorker, initargs = (filename,)) as executor:
+            futures = [executor.submit(_sweepShard, *shard) for shard in shards(ninputs, sizes,\
+            workers*shardsPerWorker, precision)]
+            for future in futures:
+                result = future.result()
+                results[result.size].merge(result)
+
+    return [results[size] for size in sizes]
+
+def main(argv):
+    ''' Command line entry point '''
+
+    parser = argparse.ArgumentParser(description = 'Energy of every subset of the inputs of a circuit')
+    parser.add_argument('circuit', help = 'circuit JSON file')
+    parser.add_argument('--sizes', type = int, nargs = '+', required = True, help = 'subset sizes')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of processes (default: all cores)')
+    parser.add_argument('--output', default = None, help = 'JSON file for the results (default: stdout)')
+    args = parser.parse_args(argv)
+
+    results = [r.toJSON() for r in sweep(args.circuit, args.sizes, args.workers)]
+
+    if args.output == None:
+        json.dump(results, sys.stdout, indent = 4)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent = 4)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,133 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bytes read at once from a trace
+CHUNK = 1 << 22
+
+# Whitespace ending a text chunk
+_WHITESPACE = b' \t\r\n\v\f'
+
+def readChunks(stream, size = CHUNK):
+    ''' Yields chunks of up to size bytes of a binary stream '''
+
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def textVectors(chunks, base = 2):
+    ''' Yields lists of vectors from text chunks, one vector per line (or per
+        whitespace separated token). Vectors are bit strings, most significant
+        bit first (base 2), or hexadecimal (base 16). Lines starting with # are
+        comments. Tokens split between chunks are joined '''
+
+    rest = b''
+
+    for chunk in chunks:
+        chunk = rest + chunk
+
+        # Comments, only looked for when there may be one
+        if b'#' in chunk:
+            lines = chunk.split(b'\n')
+            rest = lines.pop()
+            chunk = b'\n'.join(line for line in lines if not line.lstrip().startswith(b'#'))
+            tokens = chunk.split()
+        else:
+            tokens = chunk.split()
+            rest = b''
+
+            # Last token may continue on the next chunk
+            if tokens and chunk[-1] not in _WHITESPACE:
+                rest = tokens.pop()
+
+        if tokens:
+            yield [int(token, base) for token in tokens]
+
+    if rest and not rest.lstrip().startswith(b'#'):
+        tokens = rest.split()
+        if tokens:
+            yield [int(token, base) for token in tokens]
+
+def packedVectors(chunks, nbits):
+    ''' Yields arrays (or lists, without NumPy or for odd sizes) of vectors from
+        binary chunks, each vector being ceil(nbits/8) little endian bytes '''
+
+    size = (nbits + 7) >> 3
+    rest = b''
+
+    for chunk in chunks:
+        chunk = rest + chunk
+        end = len(chunk) - len(chunk) % size
+        rest = chunk[end:]
+
+        if end == 0:
+            continue
+
+        if np != None and size in (1, 2, 4, 8):
+            yield np.frombuffer(chunk, dtype = '<u' + str(size), count = end//size)
+        else:
+            yield [int.from_bytes(chunk[i:i+size], 'little') for i in range(0, end, size)]
+
+    assert not rest, "[ERROR] TRUNCATED VECTOR AT THE END OF TRACE"
+
+def windows(pieces, size):
+    ''' Splits a stream of lists or arrays of vectors at every size vectors,
+        without copying or joining them. Yields (vectors, end), end being set
+        on the last part of each window of size vectors and at the end of the
+        stream (then with no vectors if the window is already complete) '''
+
+    count = 0
+    piece = []
+
+    for piece in pieces:
+        start = 0
+
+        while len(piece) - start >= size - count:
+            yield piece[start:start + size - count], True
+            start += size - count
+            count = 0
+
+        if start < len(piece):
+            yield piece[start:], False
+            count += len(piece) - start
+
+    if count:
+        yield piece[0:0], True
+
+def flatten(pieces):
+    ''' Yields every vector of a stream of vector lists or arrays, as ints '''
+
+    for piece in pieces:
+        yield from (piece.tolist() if np != None and isinstance(piece, np.ndarray) else piece)
+
+def replay(circuit, pieces, every):
+    ''' Applies a stream of vector lists or arrays to a circuit as it arrives,
+        so only one piece is held at a time. Yields (vectors applied, energy
+        so far) every vectors and at the end of the stream '''
+
+    applied = 0
+
+    for vectors, end in windows(pieces, every):
+        if len(vectors):
+            applyBatch(circuit, vectors)
+            applied += len(vectors)
+
+        if end:
+            yield applied, circuit.calculateEnergy()
+
+def applyBatch(circuit, vectors, outputs = False):
+    ''' Applies a list or array of vectors to a circuit at once. Returns the
+        circuit output of each vector (an array, or a list without NumPy) if
+        outputs is set '''
+
+    # Python ints when vectors do not fit on NumPy
+    if np != None and circuit.getInputNumber() <= 63:
+        return circuit.applyInputs(np.asarray(vectors, dtype = np.uint64), outputs = outputs)
+    else:
+        return circuit.applyInputsParallel([int(vector) for vector in vectors], outputs = outputs)
+
+if __name__ == "__main__":
+    pass
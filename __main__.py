@@ -1,57 +1,122 @@
-from LogicDiagram import LogicDiagram, readCircuitJSON
+import argparse
 import os
 import sys
 
-'''assert len(sys.argv) > 1, "[ERROR] NO ARGUMENTS"
-assert len(sys.argv) > 2, "[ERROR] NO BINARY INPUTS"
-
-# Reads JSON
-circuit = readCircuitJSON(os.path.join(sys.path[0], sys.argv[1]))
-
-for arg in sys.argv[2:]:
-
-	binaryInput = 0
-	power = 1 << len(arg)-1
-	
-	for i in range(0, len(arg)):
-		binaryInput += power*int(arg[i])
-		power = power >> 1
-		
-	circuit.applyInput(binaryInput)
-	
-print(circuit.calculateEnergy())'''
-
-# TESTES SEM ARGUMENTOS!
-circuit = readCircuitJSON(os.path.join(sys.path[0], 'circuit2.json'))
-
-a = ['0000', '0001', '0010', '0011', '0100', '0101', '0110', '0111', '1000', '1001', '1010', '1011', '1100', '1101', '1110', '1111']
-
-for arg in a:
-
-	binaryInput = 0
-	power = 1 << len(arg)-1
-	
-	for i in range(0, len(arg)):
-		binaryInput += power*int(arg[i])
-		power = power >> 1
-		
-	circuit.applyInput(binaryInput)
-	
-print(circuit.calculateEnergy())
-
-circuit2 = readCircuitJSON(os.path.join(sys.path[0], 'circuit3.json'))
-
-a = ['0000', '0001', '0010', '0011', '0100', '0101', '0110', '0111', '1000', '1001', '1010', '1011', '1100', '1101', '1110', '1111']
-
-for arg in a:
-
-	binaryInput = 0
-	power = 1 << len(arg)-1
-	
-	for i in range(0, len(arg)):
-		binaryInput += power*int(arg[i])
-		power = power >> 1
-		
-	circuit2.applyInput(binaryInput)
-	
-print(circuit2.calculateEnergy())
\ No newline at end of file
+# Modules are imported by name, whether run as a directory or with -m
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Group import CircuitGroup
+from LogicDiagram import readCircuitJSON
+from Profile import formatStats
+from Trace import CHUNK, readChunks, textVectors, packedVectors, flatten, replay
+import Server
+import Sweep
+
+def run(args):
+    ''' Replays a trace of input vectors, printing the energy every so many vectors
+        (of the whole trace so far, or of the last window vectors) '''
+
+    if len(args.circuit) > 1:
+        runGroup(args)
+        return
+
+    circuit = readCircuitJSON(args.circuit[0])
+    if args.profile != None:
+        circuit.profile()
+
+    stream = sys.stdin.buffer if args.trace == '-' else open(args.trace, 'rb')
+
+    try:
+        vectors = _traceVectors(args, stream, circuit.getInputNumber())
+
+        if args.window == None:
+            samples = replay(circuit, vectors, args.every)
+        else:
+            samples = circuit.windowEnergy(flatten(vectors), args.window, args.every)
+
+        for applied, energy in samples:
+            print('%d\t%r' % (applied, energy), flush = True)
+
+        if args.profile != None:
+            print(formatStats(circuit.stats(), args.profile), file = sys.stderr)
+
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+def runGroup(args):
+    ''' Replays a trace on several circuits in lockstep, printing the energy of
+        each one every so many vectors, and their output mismatches if compared '''
+
+    assert args.window == None and args.profile == None, "[ERROR] --window AND --profile TAKE ONE CIRCUIT"
+
+    stream = sys.stdin.buffer if args.trace == '-' else open(args.trace, 'rb')
+
+    try:
+        with CircuitGroup(args.circuit, args.compare, args.pool) as group:
+            for applied, energies in group.replay(_traceVectors(args, stream, group.nbitsInput), args.every):
+                print('%d\t%s' % (applied, '\t'.join(repr(energy) for energy in energies)), flush = True)
+
+            for k in range(1, len(group)):
+                if group.mismatches[k]:
+                    vector, input, expected, output = group.firstMismatch[k]
+                    print('[MISMATCH] %s: %d vectors, first at vector %d (input %d: %d instead of %d)' %\
+                    (group.names[k], group.mismatches[k], vector, input, output, expected), file = sys.stderr)
+
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+def _traceVectors(args, stream, nbits):
+    ''' Stream of vector lists or arrays of a trace in the given format '''
+
+    chunks = readChunks(stream, args.chunk)
+
+    if args.format == 'packed':
+        return packedVectors(chunks, nbits)
+
+    return textVectors(chunks, 16 if args.format == 'hex' else 2)
+
+def main(argv):
+    ''' Command line entry point '''
+
+    parser = argparse.ArgumentParser(prog = 'digitalenergy', description = 'Energy of digital circuits')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    parser_run = commands.add_parser('run', help = 'replay a trace of input vectors')
+    parser_run.add_argument('circuit', nargs = '+', help = 'circuit JSON file (several are evaluated in lockstep)')
+    parser_run.add_argument('--trace', required = True, help = 'trace file, or - for stdin')
+    parser_run.add_argument('--format', choices = ('bin', 'hex', 'packed'), default = 'bin',\
+    help = 'one bit string (most significant bit first) or hexadecimal number per line, '\
+    'or packed little endian vectors of whole bytes (default: bin)')
+    parser_run.add_argument('--every', type = int, default = 1 << 20, help = 'vectors between energy reports')
+    parser_run.add_argument('--window', type = int, default = None,\
+    help = 'report the energy of the last WINDOW vectors instead of the whole trace so far')
+    parser_run.add_argument('--chunk', type = int, default = CHUNK, help = 'bytes read from the trace at once')
+    parser_run.add_argument('--profile', type = int, default = None, metavar = 'N',\
+    help = 'print the time per phase and the N slowest gates to stderr')
+    parser_run.add_argument('--compare', action = 'store_true',\
+    help = 'with several circuits, report the vectors where their outputs differ from the first one')
+    parser_run.add_argument('--pool', choices = ('thread', 'process'), default = None,\
+    help = 'with several circuits, evaluate each one on a thread or on its own process')
+
+    # Every other argument goes to the sweep or the server
+    commands.add_parser('sweep', help = 'energy of every subset of the inputs (see sweep --help)', add_help = False)
+    commands.add_parser('serve', help = 'resident server of circuit evaluations (see serve --help)', add_help = False)
+
+    if argv[0:1] == ['sweep']:
+        Sweep.main(argv[1:])
+        return
+
+    if argv[0:1] == ['serve']:
+        Server.main(argv[1:])
+        return
+
+    args = parser.parse_args(argv)
+
+    assert args.every > 0, "[ERROR] INVALID REPORT INTERVAL"
+
+    run(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
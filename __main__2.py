@@ -1,4 +1,5 @@
 from LogicDiagram import LogicDiagram, readCircuitJSON
+from Equivalence import equivalent
 import itertools
 import os
 import sys
@@ -16,22 +17,25 @@ def convertArg(arg):
 circuit1 = readCircuitJSON(os.path.join(sys.path[0], 'circuit2.json'))
 circuit2 = readCircuitJSON(os.path.join(sys.path[0], 'circuit3.json'))
 
+# Both circuits must give the same outputs
+same, counterexample = equivalent(circuit1, circuit2)
+assert same, "For same input: {} We got two different results".format(counterexample)
+
+# Local inputs of every gate for every input, computed once
+profile1 = circuit1.energyProfile().build()
+
 inputs = ["".join(i) for i in list(itertools.product('01', repeat=circuit1.getInputNumber()))]
+
 for i in range(2, len(inputs) + 1):
     combs = itertools.combinations(inputs, i)
     for group in combs:
         outputs = []
-        circuit1.resetInputs()
-        circuit2.resetInputs()
+        counts = [0]*len(inputs)
         for arg in group:
             binaryArg = convertArg(arg)
-            circuit1.applyInput(binaryArg)
-            circuit2.applyInput(binaryArg)
-            a = circuit1.getOutput(binaryArg)
-            b = circuit2.getOutput(binaryArg)
-            assert a == b, "For same input: {} We got two different results: {} {}".format(binaryArg, a, b)
-            outputs.append(circuit1.getOutput(binaryArg))
+            counts[binaryArg] += 1
+            outputs.append(profile1.outputs[binaryArg])
         if (len(set(outputs)) == 1):
             print("[WARNING] Wire")
         else:
-            print(circuit1.calculateEnergy())
\ No newline at end of file
+            print(profile1.energyOf(counts))
\ No newline at end of file
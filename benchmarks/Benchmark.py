@@ -0,0 +1,188 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Modules of the library are imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LogicDiagram import readCircuitJSON
+from Generators import GENERATORS
+
+# Timed metrics, lower is better, compared against a baseline
+TIMES = ('load', 'loadCached', 'applyInput', 'applyInputCodegen', 'calculateEnergy', 'sweep')
+
+# Runs of each timed metric, the fastest one is kept
+REPEAT = 5
+
+# Slowdowns under this many seconds are never regressions, whatever the
+# ratio, as timer noise alone gives large ratios on very short timings
+FLOOR = 0.005
+
+def _timed(function, *args):
+    ''' Result of a call and the seconds it took, without garbage
+        collections in between (as timeit) '''
+
+    collecting = gc.isenabled()
+    gc.disable()
+
+    try:
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+    finally:
+        if collecting:
+            gc.enable()
+
+    return result, seconds
+
+def _best(repeat, function, *args):
+    ''' Result of the last of repeat calls and the seconds of the fastest one '''
+
+    best = None
+    for _ in range(0, repeat):
+        result, seconds = _timed(function, *args)
+        if best == None or seconds < best:
+            best = seconds
+
+    return result, best
+
+def benchmark(name, args, directory, vectors = 2000, sweepSteps = 200, seed = 0, repeat = REPEAT):
+    ''' Times one generated circuit, returning a dict of results. Every time
+        is the fastest of repeat runs '''
+
+    generator = GENERATORS[name][0]
+    filename = os.path.join(directory, name + '_' + '_'.join(str(a) for a in args) + '.json')
+    with open(filename, 'w') as f:
+        json.dump(generator(*args), f)
+
+    result = {'circuit' : name, 'args' : list(args)}
+
+    # Loads, without and with the compiled cache (written by the first cached load)
+    circuit, result['load'] = _best(repeat, readCircuitJSON, filename, False)
+    readCircuitJSON(filename)
+    circuit, result['loadCached'] = _best(repeat, readCircuitJSON, filename)
+
+    result['gates'] = len(circuit.ports) - 2
+    result['inputs'] = circuit.getInputNumber()
+    result['outputs'] = circuit.nbitsOutput
+
+    rng = random.Random(seed)
+    inputs = [rng.getrandbits(circuit.getInputNumber()) for _ in range(0, vectors)]
+
+    # Vectors per second, one at a time
+    def apply():
+        for input in inputs:
+            circuit.applyInput(input)
+
+    # Each energy follows its own vectors, so it always has their counts to add
+    applies = []
+    energies = []
+    for _ in range(0, repeat):
+        applies.append(_timed(apply)[1])
+        energies.append(_timed(circuit.calculateEnergy)[1])
+
+    result['applyInput'] = min(applies)
+    result['vectorsPerSecond'] = vectors/result['applyInput'] if result['applyInput'] else None
+    result['calculateEnergy'] = min(energies)
+
+    # The same, on code generated for the circuit (once generated)
+    circuit.compile('pycodegen')
+    apply()
+    _, result['applyInputCodegen'] = _best(repeat, apply)
+    circuit.compile('table')
+
+    # Subsets of 3 of the first distinct inputs, in revolving door order
+    def sweep():
+        steps = 0
+        for _ in circuit.sweepCombinations(list(dict.fromkeys(inputs))[0:12], 3):
+            steps += 1
+            if steps == sweepSteps:
+                break
+        return steps
+
+    steps, result['sweep'] = _best(repeat, sweep)
+    result['sweepStepsPerSecond'] = steps/result['sweep'] if result['sweep'] else None
+
+    # Peak memory of a load and the vectors, on its own as tracing slows it down
+    circuit.close()
+    tracemalloc.start()
+    circuit = readCircuitJSON(filename, False)
+    apply()
+    circuit.calculateEnergy()
+    result['peakMemory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result
+
+def compare(results, baseline, tolerance, floor = FLOOR):
+    ''' Timings slower than tolerance times the baseline ones (and more than
+        floor seconds slower), as (circuit, args, metric, ratio) tuples '''
+
+    previous = {(r['circuit'], tuple(r['args'])) : r for r in baseline['results']}
+    regressions = []
+
+    for result in results:
+        old = previous.get((result['circuit'], tuple(result['args'])))
+        if old == None:
+            continue
+
+        for metric in TIMES:
+            if old.get(metric) and result[metric] > tolerance*old[metric] and result[metric] - old[metric] > floor:
+                regressions.append((result['circuit'], result['args'], metric, result[metric]/old[metric]))
+
+    return regressions
+
+def main(argv):
+    ''' Command line entry point '''
+
+    parser = argparse.ArgumentParser(description = 'Benchmarks of generated circuits')
+    parser.add_argument('--only', nargs = '+', choices = sorted(GENERATORS), default = sorted(GENERATORS),\
+    help = 'generators to run (default: all)')
+    parser.add_argument('--vectors', type = int, default = 2000, help = 'vectors applied per circuit')
+    parser.add_argument('--output', default = None, help = 'JSON file for the results (default: stdout)')
+    parser.add_argument('--baseline', default = None, help = 'JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type = float, default = 1.5, help = 'slowdown reported as a regression')
+    parser.add_argument('--floor', type = float, default = FLOOR,\
+    help = 'seconds a timing must also slow down by to be a regression (default: %(default)s)')
+    parser.add_argument('--repeat', type = int, default = REPEAT, help = 'runs of each timing, the fastest is kept')
+    args = parser.parse_args(argv)
+
+    assert args.repeat > 0, "[ERROR] INVALID REPEAT"
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.only:
+            for sizes in GENERATORS[name][1]:
+                result = benchmark(name, sizes, directory, args.vectors, repeat = args.repeat)
+                results.append(result)
+                print('%-18s %-16s %6d gates %10.0f vectors/s %8.3f s load %10d bytes' % (name, sizes,\
+                result['gates'], result['vectorsPerSecond'] or 0, result['load'], result['peakMemory']), file = sys.stderr)
+
+    report = {'python' : platform.python_version(), 'platform' : platform.platform(), 'repeat' : args.repeat, 'results' : results}
+
+    if args.output == None:
+        json.dump(report, sys.stdout, indent = 4)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 4)
+
+    if args.baseline != None:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.floor)
+
+        for circuit, sizes, metric, ratio in regressions:
+            print('[REGRESSION] %s %s %s %.2fx slower' % (circuit, sizes, metric, ratio), file = sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
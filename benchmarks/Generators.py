@@ -0,0 +1,196 @@
+import random
+
+class Netlist:
+    ''' Circuit being generated, in the JSON format of readCircuitJSON '''
+
+    # Class constructor
+    def __init__(self, ninputs):
+
+        self.inputs = ['i' + str(i) for i in range(0, ninputs)]
+        self.outputs = []
+        self.gates = {}
+
+    def gate(self, type, inputs, output = None):
+        ''' Adds a gate with a single output, returning the output wire name '''
+
+        name = 'g' + str(len(self.gates))
+        output = output or 'w' + name[1:]
+        self.gates[name] = {'type' : type, 'inputs' : list(inputs), 'outputs' : [output]}
+
+        return output
+
+    def xor(self, a, b):
+        ''' Exclusive or, with four NAND gates '''
+
+        nab = self.gate('nand', [a, b])
+        return self.gate('nand', [self.gate('nand', [a, nab]), self.gate('nand', [b, nab])])
+
+    def output(self, wire):
+        ''' Makes a wire a circuit output, through a buffer '''
+
+        name = 'o' + str(len(self.outputs))
+        self.outputs.append(name)
+        self.gate('buffer', [wire], name)
+
+    def toJSON(self):
+        return {'inputs' : self.inputs, 'outputs' : self.outputs, 'gates' : self.gates}
+
+def majorityTree(depth):
+    ''' Tree of 3 input majority gates over 3^depth inputs '''
+
+    netlist = Netlist(3**depth)
+    level = netlist.inputs
+
+    while len(level) > 1:
+        level = [netlist.gate('majority', level[i:i+3]) for i in range(0, len(level), 3)]
+
+    netlist.output(level[0])
+
+    return netlist.toJSON()
+
+def _fullAdder(netlist, a, b, carry):
+    ''' Sum and carry of a full adder (carry being a majority gate) '''
+
+    return netlist.xor(netlist.xor(a, b), carry), netlist.gate('majority', [a, b, carry])
+
+def rippleCarryAdder(nbits):
+    ''' Adder of two nbits numbers (inputs a0..: i0.., b0..: inext..) with carry out '''
+
+    netlist = Netlist(2*nbits)
+    a = netlist.inputs[0:nbits]
+    b = netlist.inputs[nbits:]
+
+    # First bit is a half adder
+    carry = netlist.gate('and', [a[0], b[0]])
+    netlist.output(netlist.xor(a[0], b[0]))
+
+    for i in range(1, nbits):
+        total, carry = _fullAdder(netlist, a[i], b[i], carry)
+        netlist.output(total)
+
+    netlist.output(carry)
+
+    return netlist.toJSON()
+
+def _rippleAdd(netlist, x, y):
+    ''' Wires of the sum of two numbers given by their wires, from bit 0 '''
+
+    total = []
+    carry = None
+
+    for i in range(0, max(len(x), len(y))):
+        bits = [w for w in (x[i] if i < len(x) else None, y[i] if i < len(y) else None, carry) if w != None]
+
+        if len(bits) == 3:
+            sum, carry = _fullAdder(netlist, *bits)
+        elif len(bits) == 2:
+            sum, carry = netlist.xor(*bits), netlist.gate('and', bits)
+        else:
+            sum, carry = bits[0], None
+
+        total.append(sum)
+
+    if carry != None:
+        total.append(carry)
+
+    return total
+
+def arrayMultiplier(nbits):
+    ''' Multiplier of two nbits numbers, adding the partial products row by row '''
+
+    netlist = Netlist(2*nbits)
+    a = netlist.inputs[0:nbits]
+    b = netlist.inputs[nbits:]
+
+    # Running sum of the partial products, its bit 0 being final on each row
+    total = [netlist.gate('and', [a[i], b[0]]) for i in range(0, nbits)]
+
+    for j in range(1, nbits):
+        netlist.output(total[0])
+        total = _rippleAdd(netlist, total[1:], [netlist.gate('and', [a[i], b[j]]) for i in range(0, nbits)])
+
+    for wire in total:
+        netlist.output(wire)
+
+    return netlist.toJSON()
+
+def randomDAG(ninputs, ngates, depth, maxFanout = 4, seed = 0):
+    ''' Random circuit of 2 and 3 input gates on depth levels, no wire feeding
+        more than maxFanout gates. Wires feeding no gate are outputs '''
+
+    rng = random.Random(seed)
+    netlist = Netlist(ninputs)
+    types = ('and', 'or', 'nand', 'nor', 'majority')
+
+    # Wires of the previous level and wires of any level, that may still
+    # feed more gates (full ones are dropped when picked)
+    previous = list(netlist.inputs)
+    available = list(netlist.inputs)
+    wires = list(netlist.inputs)
+    fanout = {wire : 0 for wire in netlist.inputs}
+
+    def pick(candidates):
+        while candidates:
+            i = rng.randrange(len(candidates))
+            if fanout[candidates[i]] < maxFanout:
+                return candidates[i]
+            candidates[i] = candidates[-1]
+            candidates.pop()
+        return rng.choice(wires)
+
+    for level in range(1, depth + 1):
+        count = ngates//depth + (1 if level <= ngates % depth else 0)
+        current = []
+
+        for _ in range(0, count):
+            type = rng.choice(types)
+            n = 3 if type == 'majority' else rng.randint(2, 3)
+
+            # One input from the previous level (keeps the depth), others from any
+            inputs = [pick(previous)] + [pick(available) for _ in range(1, n)]
+            for wire in inputs:
+                fanout[wire] += 1
+
+            wire = netlist.gate(type, inputs)
+            fanout[wire] = 0
+            current.append(wire)
+
+        previous = list(current)
+        available.extend(current)
+        wires.extend(current)
+
+    for wire in wires[ninputs:]:
+        if fanout[wire] == 0:
+            netlist.output(wire)
+
+    return netlist.toJSON()
+
+def wideTree(ninputs, width):
+    ''' Tree of width input gates over ninputs, alternating AND and OR levels '''
+
+    netlist = Netlist(ninputs)
+    level = netlist.inputs
+    types = ('and', 'or')
+    depth = 0
+
+    while len(level) > 1:
+        type = types[depth % 2]
+        level = [netlist.gate(type, level[i:i+width]) if len(level[i:i+width]) > 1 else level[i]\
+        for i in range(0, len(level), width)]
+        depth += 1
+
+    netlist.output(level[0])
+
+    return netlist.toJSON()
+
+# Generators by name, with the sizes benchmarked by default
+GENERATORS = {
+    'majorityTree' : (majorityTree, [(2,), (3,), (4,)]),
+    'rippleCarryAdder' : (rippleCarryAdder, [(4,), (8,), (16,)]),
+    'arrayMultiplier' : (arrayMultiplier, [(3,), (4,), (6,)]),
+    'randomDAG' : (randomDAG, [(8, 100, 10), (12, 1000, 20), (16, 10000, 40)]),
+    'wideTree' : (wideTree, [(16, 4), (20, 8), (24, 24)])
+}
+
+if __name__ == "__main__":
+    pass
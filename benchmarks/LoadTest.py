@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Modules of the library are imported by name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Client import Client
+from Generators import GENERATORS
+
+def _startServer(socket, workers):
+    ''' Server process listening on a Unix socket '''
+
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), '--socket', socket,\
+    '--workers', str(workers)], stderr = subprocess.PIPE)
+
+    # Waits for its address line
+    line = server.stderr.readline().decode()
+    assert line.startswith('[SERVING]'), "[ERROR] SERVER DID NOT START (" + line.strip() + ")"
+
+    return server
+
+def loadTest(address, filename, clients, requests, vectors, seed = 0):
+    ''' Runs clients threads, each sending requests apply requests of vectors
+        random inputs (and an energy request every 10) to the same circuit.
+        Returns the request latencies and the total seconds '''
+
+    with Client(address) as client:
+        ninputs = client.load(filename)['inputs']
+        client.reset(filename)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def run(i):
+        rng = random.Random(seed + i)
+        mine = []
+
+        with Client(address) as client:
+            for r in range(0, requests):
+                batch = [rng.getrandbits(ninputs) for _ in range(0, vectors)]
+                start = time.perf_counter()
+                client.apply(filename, batch)
+                if r % 10 == 9:
+                    client.energy(filename)
+                mine.append(time.perf_counter() - start)
+
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target = run, args = (i,)) for i in range(0, clients)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencies, time.perf_counter() - start
+
+def main(argv):
+    ''' Command line entry point '''
+
+    parser = argparse.ArgumentParser(description = 'Load test of the resident server')
+    parser.add_argument('--circuit', default = None, help = 'circuit JSON file (default: a generated random circuit)')
+    parser.add_argument('--socket', default = None, help = 'Unix socket of a running server (default: start one)')
+    parser.add_argument('--clients', type = int, default = 8, help = 'concurrent clients')
+    parser.add_argument('--requests', type = int, default = 100, help = 'requests per client')
+    parser.add_argument('--vectors', type = int, default = 64, help = 'vectors per request')
+    parser.add_argument('--workers', type = int, default = 1, help = 'sweep processes of the started server')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = args.circuit
+        if filename == None:
+            filename = os.path.join(directory, 'random.json')
+            with open(filename, 'w') as f:
+                json.dump(GENERATORS['randomDAG'][0](12, 1000, 20), f)
+
+        server = None
+        address = args.socket
+        if address == None:
+            address = os.path.join(directory, 'server.sock')
+            server = _startServer(address, args.workers)
+
+        try:
+            latencies, seconds = loadTest(address, os.path.abspath(filename), args.clients, args.requests, args.vectors)
+
+            with Client(address) as client:
+                batches = sum(c['batches'] for c in client.circuits() if c['circuit'] == os.path.realpath(filename))
+
+        finally:
+            if server != None:
+                server.terminate()
+                server.wait()
+
+    latencies.sort()
+    total = args.clients*args.requests
+
+    print('%d requests (%d vectors each) from %d clients in %.3f s' % (total, args.vectors, args.clients, seconds))
+    print('%.0f requests/s, %.0f vectors/s, %d evaluation batches' % (total/seconds, total*args.vectors/seconds, batches))
+    print('latency: median %.2f ms, p95 %.2f ms, max %.2f ms' % (1000*statistics.median(latencies),\
+    1000*latencies[int(0.95*(len(latencies) - 1))], 1000*latencies[-1]))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])